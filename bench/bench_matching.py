@@ -0,0 +1,117 @@
+"""Benchmark matching.best_match against the original backfill scorer.
+
+    python bench/bench_matching.py [--queries 2000] [--candidates 20] [--seed 7]
+
+Builds a synthetic corpus of TMDb-like search results (accents, parentheticals,
+punctuation, near-duplicate titles, off-by-one years), times both pickers over
+the same queries and fails if any pick differs.
+"""
+import argparse, os, random, re, sys, time, unicodedata
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import matching  # noqa: E402
+
+WORDS = ("the night day last first dark love city king queen house river man woman "
+         "blue red story of a in and return rise fall dream ghost summer winter star "
+         "amélie señor café naïve über lost found secret island road war peace").split()
+
+
+# --- the pre-matching.py implementation, kept verbatim as the reference ---
+def _legacy_norm(s):
+    if not s:
+        return ""
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(c for c in s if not unicodedata.category(c).startswith("M"))
+    s = s.lower()
+    s = re.sub(r"\(.*?\)", "", s)
+    s = s.replace("&", "and")
+    s = re.sub(r"[^a-z0-9 ]+", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def _legacy_score(title_q, title_hit, year_q, year_hit):
+    t = SequenceMatcher(None, _legacy_norm(title_q), _legacy_norm(title_hit)).ratio()
+    bonus = 0.0
+    if year_q and year_hit:
+        if year_q == year_hit:
+            bonus = 0.20
+        elif abs(year_q - year_hit) == 1:
+            bonus = 0.05
+    return t + bonus
+
+
+def legacy_pick(title, year, results):
+    best, best_score = None, 0.0
+    for r in results:
+        score = _legacy_score(title, r["title"], year, r["year"])
+        if _legacy_norm(r["title"]) == _legacy_norm(title) and (not year or r["year"] == year):
+            score += 0.5
+        if score > best_score:
+            best, best_score = r, score
+    return best
+
+
+def _title(rng):
+    t = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5))).title()
+    if rng.random() < 0.15:
+        t += f" ({rng.randint(1950, 2024)})"
+    if rng.random() < 0.1:
+        t = t.replace(" And ", " & ")
+    if rng.random() < 0.1:
+        t += ": Part " + rng.choice("II III IV".split())
+    return t
+
+
+def _variant(rng, t):
+    roll = rng.random()
+    if roll < 0.3:
+        return t
+    if roll < 0.5:
+        return t.upper()
+    if roll < 0.7:
+        return t + rng.choice((" Returns", " 2", ": The Movie", "!"))
+    return _title(rng)
+
+
+def build(n_queries, n_candidates, seed):
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(n_queries):
+        title = _title(rng)
+        year = rng.choice([None, rng.randint(1950, 2024)])
+        results = []
+        for _ in range(n_candidates):
+            y = (year or rng.randint(1950, 2024)) + rng.choice((0, 0, 1, -1, 5))
+            results.append({"title": _variant(rng, title), "year": y})
+        rng.shuffle(results)
+        cases.append((title, year, results))
+    return cases
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--candidates", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    cases = build(args.queries, args.candidates, args.seed)
+
+    t0 = time.perf_counter()
+    old = [legacy_pick(t, y, res) for t, y, res in cases]
+    t1 = time.perf_counter()
+    new = [matching.best_match(t, y, res)[0] for t, y, res in cases]
+    t2 = time.perf_counter()
+
+    mismatches = sum(1 for a, b in zip(old, new) if a is not b)
+    legacy_s, new_s = t1 - t0, t2 - t1
+    print(f"{len(cases)} queries x {args.candidates} candidates")
+    print(f"legacy   {legacy_s * 1000:8.1f} ms")
+    print(f"matching {new_s * 1000:8.1f} ms   ({legacy_s / new_s:.1f}x faster)")
+    print(f"picks differing: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
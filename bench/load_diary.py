@@ -0,0 +1,172 @@
+"""Load test: concurrent diary reads while a Letterboxd import is writing.
+
+    python bench/load_diary.py [--server gunicorn|waitress] [--workers 2] [--threads 4]
+                               [--diary 10000] [--import-rows 10000] [--readers 16]
+
+Seeds a diary, starts the app under a real WSGI server (against bench/mock_tmdb.py),
+measures /diary and /api/diary latency with `--readers` client threads on
+their own, then again while POST /import runs, and prints/saves both. With
+SQLite in WAL mode the reads should keep flowing (no 5xx, no "database is
+locked") while the import commits chunk after chunk.
+"""
+import argparse, json, os, socket, subprocess, sys, tempfile, threading, time
+from datetime import datetime
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import synth  # noqa: E402
+from mock_tmdb import MockTMDB  # noqa: E402
+from run_bench import _pct, _spawn  # noqa: E402
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(kind, port, env, workers, threads, log_dir):
+    env = {**env, "PORT": str(port), "HOST": "127.0.0.1", "WEB_CONCURRENCY": str(workers),
+           "WEB_THREADS": str(threads), "ACCESS_LOG": ""}
+    if kind == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    else:
+        cmd = [sys.executable, "wsgi.py"]
+    # a file, not a pipe: nobody drains a pipe and a full one blocks the server
+    log_path = os.path.join(log_dir, "server.log")
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{base}/manifest.json", timeout=1)
+            return proc, base
+        except requests.ConnectionError:
+            if proc.poll() is not None:
+                with open(log_path, errors="replace") as fh:
+                    raise RuntimeError(fh.read()[-2000:])
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not come up")
+
+
+def _read_load(base, readers, until):
+    """Hammer /diary and /api/diary from `readers` threads until until() is true."""
+    lat, errors, lock = [], {}, threading.Lock()
+
+    def worker(n):
+        s = requests.Session()
+        i = 0
+        while not until():
+            url = f"{base}/diary" if (n + i) % 2 else f"{base}/api/diary?limit=50"
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                r = s.get(url, timeout=30)
+                status = r.status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            ms = (time.perf_counter() - t0) * 1000
+            with lock:
+                if status == 200:
+                    lat.append(ms)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    ts = [threading.Thread(target=worker, args=(n,)) for n in range(readers)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    secs = time.perf_counter() - started
+    return {"requests": len(lat), "errors": errors, "seconds": round(secs, 2),
+            "req_per_s": round(len(lat) / secs, 1), "p50_ms": _pct(lat, 0.50),
+            "p95_ms": _pct(lat, 0.95), "max_ms": _pct(lat, 1.0)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--server", choices=("gunicorn", "waitress"), default="gunicorn")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--diary", type=int, default=10000, help="Entries seeded before the test.")
+    ap.add_argument("--import-rows", type=int, default=10000)
+    ap.add_argument("--readers", type=int, default=16)
+    ap.add_argument("--baseline-seconds", type=float, default=10)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--out", default=os.path.join(BENCH_DIR, "results"))
+    args = ap.parse_args()
+    if args.server == "waitress":
+        args.workers = 1  # single process, threads only
+
+    with MockTMDB(latency_ms=args.latency_ms) as mock, \
+            tempfile.TemporaryDirectory(prefix="maxi-load-") as workdir:
+        env = {k: v for k, v in os.environ.items() if k != "TMDB_BEARER"}
+        env.update(
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'load.db')}",
+            TMDB_API_BASE=mock.base_url, TMDB_API_KEY="bench", TMDB_RATE_LIMIT="1000000",
+            TMDB_CACHE_PATH=os.path.join(workdir, "tmdb_cache.db"), CACHE_URL="sqlite",
+            TITLE_INDEX_PATH=os.path.join(workdir, "titles.db"), IMPORT_DIR=os.path.join(workdir, "imports"),
+            POSTER_CACHE_DIR=os.path.join(workdir, "posters"), SLOW_REQUEST_MS="1e9",
+        )
+        print(f"Seeding {args.diary} diary entries...", flush=True)
+        _spawn("seed", "diary", args.diary, workdir, env)
+        csv_path = synth.write_letterboxd_csv(args.import_rows, os.path.join(workdir, "import.csv"), seed=11)
+
+        proc, base = _start_server(args.server, _free_port(), env, args.workers, args.threads, workdir)
+        try:
+            print(f"{args.server}: {args.workers} worker(s) x {args.threads} threads on {base}", flush=True)
+            deadline = time.monotonic() + args.baseline_seconds
+            baseline = _read_load(base, args.readers, lambda: time.monotonic() > deadline)
+
+            with open(csv_path, "rb") as fh:
+                r = requests.post(f"{base}/import", files={"file": ("import.csv", fh, "text/csv")},
+                                  allow_redirects=False, timeout=120)
+            job_id = r.headers["Location"].split("job=")[-1]
+            status, done = {}, threading.Event()
+            import_started = time.monotonic()
+
+            def poll_import():
+                while not done.is_set():
+                    status.update(requests.get(f"{base}/api/import/{job_id}", timeout=10).json())
+                    if status.get("status") in ("done", "failed"):
+                        done.set()
+                    done.wait(0.5)
+
+            poller = threading.Thread(target=poll_import, daemon=True)
+            poller.start()
+            during = _read_load(base, args.readers, done.is_set)
+            import_secs = time.monotonic() - import_started
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "server": args.server, "workers": args.workers, "threads": args.threads,
+        "readers": args.readers, "diary": args.diary, "import_rows": args.import_rows,
+        "baseline": baseline, "during_import": during,
+        "import": {"seconds": round(import_secs, 1), "status": status.get("status"),
+                   "rows_inserted": status.get("inserted"), "error": status.get("error")},
+    }
+    for name in ("baseline", "during_import"):
+        r = report[name]
+        print(f"{name:14} {r['req_per_s']:>7} req/s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  "
+              f"max {r['max_ms']} ms  errors {r['errors'] or 0}")
+    imp = report["import"]
+    print(f"import         {imp['status']} in {imp['seconds']}s, {imp['rows_inserted']} rows inserted")
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
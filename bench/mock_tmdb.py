@@ -0,0 +1,190 @@
+"""Local stand-in for the TMDb v3 API, for benchmarks and load tests.
+
+    python bench/mock_tmdb.py [--port 8765] [--latency-ms 20] [--error-rate 0.01] [--rate-429 0.02]
+    TMDB_API_BASE=http://127.0.0.1:8765/3 flask run
+
+Answers the endpoints the app uses (/search/{movie,tv,multi}, /movie/<id>,
+/tv/<id> and their credits) with deterministic fake data: a search always
+returns the queried title itself (with the requested year) plus a few decoys,
+so matching behaves like it does against the real catalogue. Latency, 5xx
+and 429 rates are configurable to exercise retries and backoff.
+"""
+import argparse, json, random, re, threading, time, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_DETAIL = re.compile(r"^/3/(movie|tv)/(\d+)(?:/(credits|aggregate_credits))?$")
+
+
+def _tmdb_id(title: str) -> int:
+    return zlib.crc32(title.lower().encode()) % 9_000_000 + 1
+
+
+def _year_for(title: str) -> int:
+    return 1950 + zlib.crc32(title.encode()) % 75
+
+
+def _cast(n=20):
+    return [{"id": 1000 + i, "name": f"Actor {i}", "character": f"Role {i}",
+             "profile_path": f"/actor{i}.jpg"} for i in range(n)]
+
+
+class MockTMDB:
+    """Threaded HTTP server; use as a context manager or start()/stop()."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=20.0, jitter_ms=5.0,
+                 error_rate=0.0, rate_429=0.0, retry_after=0, seed=7):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts: dict[int, int] = {}  # status -> responses sent
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/3"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def config(self) -> dict:
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms,
+                "error_rate": self.error_rate, "rate_429": self.rate_429,
+                "retry_after": self.retry_after}
+
+    # --- responses ---
+    def _roll(self):
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            r = self._rng.random()
+        if r < self.rate_429:
+            return delay, 429
+        if r < self.rate_429 + self.error_rate:
+            return delay, 500
+        return delay, 200
+
+    @staticmethod
+    def _search(kind, query, year):
+        query = query.strip() or "untitled"
+        titles = [query, f"{query} II", f"The {query}", f"{query}: Reloaded", f"Return of {query}"]
+        base_year = int(year) if year and str(year).isdigit() else _year_for(query)
+        results = []
+        for n, t in enumerate(titles):
+            y = base_year + n  # decoys drift off the requested year
+            tid = _tmdb_id(f"{kind}:{t}")
+            item = {"id": tid, "poster_path": f"/{tid:x}.jpg", "popularity": 100.0 / (n + 1),
+                    "overview": f"A film called {t}."}
+            if kind == "tv":
+                item.update(name=t, first_air_date=f"{y}-06-01")
+            else:
+                item.update(title=t, release_date=f"{y}-06-01")
+            if kind == "multi":
+                item["media_type"] = "movie"
+            results.append(item)
+        return {"page": 1, "results": results, "total_results": len(results), "total_pages": 1}
+
+    @staticmethod
+    def _detail(kind, tid, sub, append):
+        if sub:
+            return {"id": tid, "cast": _cast()}
+        d = {"id": tid, "poster_path": f"/{tid:x}.jpg", "overview": "Synthetic.",
+             "genres": [{"id": 18, "name": "Drama"}, {"id": 35, "name": "Comedy"}],
+             "production_companies": [{"id": 1, "name": "Mock Pictures"}],
+             "vote_average": 7.1, "status": "Released"}
+        if kind == "movie":
+            d.update(title=f"Movie {tid}", release_date=f"{_year_for(str(tid))}-06-01", runtime=104)
+        else:
+            d.update(name=f"Series {tid}", first_air_date=f"{_year_for(str(tid))}-06-01",
+                     episode_run_time=[42])
+        for part in filter(None, append.split(",")):
+            d[part] = {"id": tid, "cast": _cast()}
+        return d
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+                with mock._lock:
+                    mock.counts[status] = mock.counts.get(status, 0) + 1
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(u.query).items()}
+                delay, status = mock._roll()
+                time.sleep(delay)
+                if status == 429:
+                    return self._send(429, {"status_code": 25, "status_message": "Rate limited."},
+                                      {"Retry-After": str(mock.retry_after)})
+                if status == 500:
+                    return self._send(500, {"status_code": 11, "status_message": "Internal error."})
+
+                if u.path.startswith("/3/search/"):
+                    kind = u.path.rsplit("/", 1)[-1]
+                    if kind not in ("movie", "tv", "multi"):
+                        return self._send(404, {"status_code": 34})
+                    year = q.get("year") or q.get("primary_release_year") or q.get("first_air_date_year")
+                    return self._send(200, mock._search(kind, q.get("query", ""), year))
+                m = _DETAIL.match(u.path)
+                if m:
+                    kind, tid, sub = m.group(1), int(m.group(2)), m.group(3)
+                    return self._send(200, mock._detail(kind, tid, sub, q.get("append_to_response", "")))
+                self._send(404, {"status_code": 34, "status_message": "Not found."})
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses.")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="Fraction of 429 responses.")
+    ap.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with 429s.")
+    args = ap.parse_args()
+    mock = MockTMDB(args.host, args.port, args.latency_ms, args.jitter_ms,
+                    args.error_rate, args.rate_429, args.retry_after)
+    print(f"Mock TMDb on {mock.base_url} ({json.dumps(mock.config())})", flush=True)
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""End-to-end benchmarks for the hot paths, against a local mock TMDb.
+
+    python bench/run_bench.py [--scenarios import,backfill,diary,api_diary,tmdb]
+                              [--sizes 1000,10000,100000] [--latency-ms 20]
+                              [--error-rate 0] [--rate-429 0] [--compare bench/results/<old>.json]
+
+Scenarios:
+  import     ingest_letterboxd() over a synthetic Letterboxd CSV (per-chunk latency)
+  backfill   `flask backfill-posters` over a diary with no posters (per-batch latency)
+  diary      GET /diary, then infinite-scroll pages until the end (max 200 requests)
+  api_diary  GET /api/diary?limit=200 following next_cursor (max 1000 requests)
+  tmdb       TMDBClient search/get_movie/get_series, uncached, 8 threads (--tmdb-calls)
+
+Each (scenario, size) runs in a fresh interpreter with its own SQLite database,
+so peak RSS is per scenario; diaries are seeded in a separate process first.
+TMDB_API_BASE points the app at bench/mock_tmdb.py. Results are printed and
+written to bench/results/<timestamp>-<commit>.json; --compare prints the
+change in throughput and p95 against an earlier results file.
+"""
+import argparse, json, os, platform, re, resource, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html import unescape
+from itertools import islice
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import synth  # noqa: E402
+from mock_tmdb import MockTMDB  # noqa: E402
+
+SCENARIOS = ("import", "backfill", "diary", "api_diary", "tmdb")
+SEEDED = {"backfill": False, "diary": True, "api_diary": True}  # scenario -> posters in seed
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes vs KB
+
+
+def _pct(vals, q):
+    if not vals:
+        return None
+    vals = sorted(vals)
+    return round(vals[min(len(vals) - 1, int(q * len(vals)))], 2)
+
+
+def _chunks(it, n):
+    it = iter(it)
+    while chunk := list(islice(it, n)):
+        yield chunk
+
+
+# --- child side: one scenario in a fresh process ---
+def _app():
+    from app import create_app
+    return create_app()
+
+
+def _seed(n, posters):
+    from extensions import db
+    from migrations import upgrade
+    from models import DiaryEntry
+    with _app().app_context():
+        upgrade()
+        for chunk in _chunks(synth.diary_entry_dicts(n, posters=posters), 5000):
+            db.session.execute(DiaryEntry.__table__.insert(), chunk)
+        db.session.commit()
+
+
+def _run_import(size, workdir):
+    from migrations import upgrade
+    from views.imports import ingest_letterboxd
+    path = synth.write_letterboxd_csv(size, os.path.join(workdir, "letterboxd.csv"))
+    lat, last = [], [time.perf_counter()]
+
+    def progress(counts):
+        now = time.perf_counter()
+        lat.append((now - last[0]) * 1000)
+        last[0] = now
+
+    with _app().app_context():
+        upgrade()
+        rss0 = _peak_rss_mb()
+        started = time.perf_counter()
+        with open(path, "rb") as fh:
+            counts = ingest_letterboxd(fh, progress=progress)
+        secs = time.perf_counter() - started
+    return {"ops": counts["rows_parsed"], "unit": "rows", "seconds": secs, "latencies_ms": lat,
+            "baseline_rss_mb": rss0, "extra": counts}
+
+
+def _run_backfill(size, workdir):
+    from models import DiaryEntry
+    from views import imports
+    app = _app()
+    imports.BACKFILL_CHECKPOINT = os.path.join(workdir, "backfill.json")
+    lat, last = [], [None]
+    write_checkpoint = imports._write_checkpoint
+
+    def timed_checkpoint(last_id):  # called once per committed batch
+        now = time.perf_counter()
+        lat.append((now - last[0]) * 1000)
+        last[0] = now
+        write_checkpoint(last_id)
+
+    imports._write_checkpoint = timed_checkpoint
+    rss0 = _peak_rss_mb()
+    last[0] = started = time.perf_counter()
+    res = app.test_cli_runner().invoke(args=["backfill-posters", "--restart"])
+    secs = time.perf_counter() - started
+    if res.exception:
+        raise res.exception
+    with app.app_context():
+        filled = DiaryEntry.query.filter(DiaryEntry.poster_url.isnot(None)).count()
+    return {"ops": size, "unit": "entries", "seconds": secs, "latencies_ms": lat,
+            "baseline_rss_mb": rss0, "extra": {"filled": filled}}
+
+
+def _walk(client, first_url, next_url, max_requests):
+    lat, url, rows = [], first_url, 0
+    started = time.perf_counter()
+    while url and len(lat) < max_requests:
+        t0 = time.perf_counter()
+        r = client.get(url)
+        lat.append((time.perf_counter() - t0) * 1000)
+        if r.status_code != 200:
+            raise RuntimeError(f"{url} -> {r.status_code}")
+        url, n = next_url(r)
+        rows += n
+    return lat, rows, time.perf_counter() - started
+
+
+def _run_diary(size, workdir):
+    c = _app().test_client()
+    more = re.compile(r'data-next="([^"]+)"')
+
+    def next_url(r):
+        html = r.get_data(as_text=True)
+        m = more.search(html)
+        return (unescape(m.group(1)) if m else None), html.count('<li class="row">')
+
+    rss0 = _peak_rss_mb()
+    lat, rows, secs = _walk(c, "/diary", next_url, 200)
+    return {"ops": len(lat), "unit": "requests", "seconds": secs, "latencies_ms": lat,
+            "baseline_rss_mb": rss0, "extra": {"rows": rows}}
+
+
+def _run_api_diary(size, workdir):
+    c = _app().test_client()
+
+    def next_url(r):
+        j = r.get_json()
+        cur = j["next_cursor"]
+        return (f"/api/diary?limit=200&cursor={cur}" if cur else None), len(j["entries"])
+
+    rss0 = _peak_rss_mb()
+    lat, rows, secs = _walk(c, "/api/diary?limit=200", next_url, 1000)
+    return {"ops": len(lat), "unit": "requests", "seconds": secs, "latencies_ms": lat,
+            "baseline_rss_mb": rss0, "extra": {"rows": rows, "rows_per_s": round(rows / secs, 1)}}
+
+
+def _run_tmdb(size, workdir):
+    from tmdb import TMDBClient, RateLimiter
+    client = TMDBClient(api_key="bench", rate_limiter=RateLimiter(rate=1e6, burst=1000))
+    calls = int(os.environ["BENCH_TMDB_CALLS"])
+    titles = [r["title"] for r in synth.diary_rows(calls)]
+    jobs = []
+    for i, t in enumerate(titles):
+        jobs.append((client.search, t) if i % 3 == 0 else
+                    (client.get_movie, 1000 + i) if i % 3 == 1 else (client.get_series, 1000 + i))
+    errors = 0
+
+    def one(job):
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            job[0](job[1])
+        except Exception:
+            errors += 1
+        return (time.perf_counter() - t0) * 1000
+
+    rss0 = _peak_rss_mb()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        lat = list(pool.map(one, jobs))
+    secs = time.perf_counter() - started
+    return {"ops": len(jobs), "unit": "calls", "seconds": secs, "latencies_ms": lat,
+            "baseline_rss_mb": rss0, "extra": {"errors": errors}}
+
+
+def child(phase, scenario, size, workdir):
+    if phase == "seed":
+        _seed(size, SEEDED[scenario])
+        return
+    out = globals()[f"_run_{scenario}"](size, workdir)
+    lat = out.pop("latencies_ms")
+    out.update(
+        scenario=scenario, size=size if scenario != "tmdb" else None,
+        throughput=round(out["ops"] / out["seconds"], 2) if out["seconds"] else None,
+        seconds=round(out["seconds"], 3),
+        p50_ms=_pct(lat, 0.50), p95_ms=_pct(lat, 0.95), max_ms=_pct(lat, 1.0),
+        peak_rss_mb=round(_peak_rss_mb(), 1), baseline_rss_mb=round(out["baseline_rss_mb"], 1),
+    )
+    print(json.dumps(out))
+
+
+# --- parent side ---
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _spawn(phase, scenario, size, workdir, env):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", phase, scenario, str(size), workdir]
+    p = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"{scenario} {size} ({phase}) failed:\n{p.stderr[-2000:]}")
+    return p.stdout.strip().splitlines()[-1] if phase == "run" else None
+
+
+def _print_table(results, previous=None):
+    prev = {(r["scenario"], r["size"]): r for r in (previous or {}).get("results", [])}
+    print(f"{'scenario':10} {'size':>7} {'throughput':>16} {'p50 ms':>9} {'p95 ms':>9} {'peak RSS':>9}  vs. previous")
+    for r in results:
+        tp = f"{r['throughput']:.1f} {r['unit']}/s"
+        line = (f"{r['scenario']:10} {r['size'] or '-':>7} {tp:>16} {r['p50_ms'] or 0:>9.1f} "
+                f"{r['p95_ms'] or 0:>9.1f} {r['peak_rss_mb']:>7.0f}MB")
+        old = prev.get((r["scenario"], r["size"]))
+        if old and old.get("throughput") and old.get("p95_ms"):
+            line += (f"  throughput {100 * (r['throughput'] / old['throughput'] - 1):+.0f}%, "
+                     f"p95 {100 * (r['p95_ms'] / old['p95_ms'] - 1):+.0f}%")
+        print(line)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _, _, phase, scenario, size, workdir = sys.argv
+        return child(phase, scenario, int(size), workdir)
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--tmdb-calls", type=int, default=1000)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--out", default=os.path.join(BENCH_DIR, "results"))
+    ap.add_argument("--compare", help="Earlier results JSON to diff against.")
+    args = ap.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        ap.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = []
+    with MockTMDB(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                  error_rate=args.error_rate, rate_429=args.rate_429) as mock:
+        for scenario in scenarios:
+            for size in ([args.tmdb_calls] if scenario == "tmdb" else sizes):
+                with tempfile.TemporaryDirectory(prefix="maxi-bench-") as workdir:
+                    env = {k: v for k, v in os.environ.items() if k != "TMDB_BEARER"}
+                    env.update(
+                        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                        TMDB_API_BASE=mock.base_url, TMDB_API_KEY="bench", TMDB_CACHE_PATH="",
+                        TMDB_RATE_LIMIT="1000000", TITLE_INDEX_PATH=os.path.join(workdir, "titles.db"),
+                        POSTER_CACHE_DIR=os.path.join(workdir, "posters"), PAGE_CACHE_ITEMS="0",
+                        SLOW_REQUEST_MS="1e9", BENCH_TMDB_CALLS=str(args.tmdb_calls),
+                    )
+                    print(f"-> {scenario} {size}", flush=True)
+                    if scenario in SEEDED:
+                        _spawn("seed", scenario, size, workdir, env)
+                    results.append(json.loads(_spawn("run", scenario, size, workdir, env)))
+        mock_cfg = {**mock.config(), "responses": mock.counts}
+
+    report = {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock": mock_cfg,
+        "results": results,
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare) as fh:
+            previous = json.load(fh)
+    print()
+    _print_table(results, previous)
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit'] or 'nogit'}.json")
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nSaved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Cold-start budget: what `import app` + create_app() costs and drags in.
+
+    python bench/startup.py [--runs 7] [--budget-ms 400] [--top 12]
+
+Every run is a fresh `python -X importtime` interpreter, so nothing is warm
+but the OS file cache. Prints the median time to build the app, the slowest
+top-level imports, and the median wall time of a DB-only CLI command
+(`flask init-db` on a scratch database, with TMDb credentials removed from the
+environment; it must not need them). Exits 1 when the median build time is
+over --budget-ms or one of DEFERRED got imported at startup, so it can gate CI.
+Results go to bench/results/startup-<timestamp>.json.
+"""
+import argparse, json, os, re, statistics, subprocess, sys, tempfile, time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+# only built on first use (see extensions.lazy); none of these may load at startup
+DEFERRED = ("requests", "urllib3", "tmdb", "tmdb_async", "title_index")
+
+_CHILD = f"""
+import json, sys, time
+sys.path.insert(0, {ROOT!r})
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "create_ms": (t2 - t1) * 1000,
+                  "modules": sorted(sys.modules)}}))
+"""
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env():
+    env = {k: v for k, v in os.environ.items() if k not in ("TMDB_BEARER", "TMDB_API_KEY")}
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def _build_once(env):
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD], cwd=ROOT, env=env,
+                       capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr[-2000:])
+    out = json.loads(p.stdout.strip().splitlines()[-1])
+    # children are listed before their parent, two spaces deeper
+    top, pending = {}, {}
+    for line in p.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if not m:
+            continue
+        depth, name, ms = len(m.group(3)), m.group(4), int(m.group(2)) / 1000
+        if depth == 3:
+            pending[name] = ms
+        elif depth == 1:
+            if name == "app":
+                top = pending
+            pending = {}
+    out["top"] = top
+    return out
+
+
+def _cli_once(env, workdir):
+    env = {**env, "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}"}
+    t0 = time.perf_counter()
+    p = subprocess.run([sys.executable, "-m", "flask", "--app", "app.py", "init-db"], cwd=ROOT, env=env,
+                       capture_output=True, text=True)
+    ms = (time.perf_counter() - t0) * 1000
+    if p.returncode != 0:
+        raise RuntimeError(f"flask init-db failed:\n{p.stderr[-2000:]}")
+    return ms
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--budget-ms", type=float, default=400,
+                    help="Fail when the median import + create_app() time is above this.")
+    ap.add_argument("--top", type=int, default=12, help="Slowest top-level imports to list.")
+    ap.add_argument("--out", default=os.path.join(BENCH_DIR, "results"))
+    args = ap.parse_args()
+
+    env = _env()
+    runs = [_build_once(env) for _ in range(args.runs)]
+    with tempfile.TemporaryDirectory(prefix="maxi-startup-") as workdir:
+        cli = [_cli_once(env, workdir) for _ in range(args.runs)]
+
+    build = [r["import_ms"] + r["create_ms"] for r in runs]
+    median = statistics.median(build)
+    top = {name: round(statistics.median(r["top"].get(name, 0) for r in runs), 1)
+           for name in runs[0]["top"]}
+    leaked = [m for m in DEFERRED if any(m in r["modules"] for r in runs)]
+
+    print(f"import app       {statistics.median(r['import_ms'] for r in runs):7.1f} ms")
+    print(f"create_app()     {statistics.median(r['create_ms'] for r in runs):7.1f} ms")
+    print(f"total (median)   {median:7.1f} ms   budget {args.budget_ms:.0f} ms")
+    print(f"flask init-db    {statistics.median(cli):7.1f} ms   (wall, new interpreter, no TMDb credentials)")
+    print(f"modules loaded   {len(runs[0]['modules'])}")
+    print("slowest imports (cumulative):")
+    for name, ms in sorted(top.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {ms:7.1f} ms  {name}")
+    if leaked:
+        print(f"loaded at startup but should be deferred: {', '.join(leaked)}")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0], "runs": args.runs, "budget_ms": args.budget_ms,
+        "import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+        "create_app_ms": round(statistics.median(r["create_ms"] for r in runs), 1),
+        "total_ms": round(median, 1), "cli_init_db_ms": round(statistics.median(cli), 1),
+        "modules": len(runs[0]["modules"]), "top_imports_ms": top, "leaked": leaked,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"startup-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Saved {path}")
+
+    if median > args.budget_ms or leaked:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Synthetic Letterboxd exports and diaries for the benchmarks.
+
+    python bench/synth.py csv 10000 /tmp/diary-10k.csv
+
+Titles come from a fixed word list with a seeded RNG, so the same size and
+seed always give the same data. About a third of rows are rewatches of an
+earlier title, like a real diary.
+"""
+import csv, random, sys
+from datetime import date, datetime, timedelta
+
+WORDS = ("night day last first dark love city king queen house river man woman blue red "
+         "story return rise fall dream ghost summer winter star lost found secret island "
+         "road war peace amélie señor café naïve über paper glass iron silver golden "
+         "midnight morning shadow light fire water earth wind heart mind").split()
+
+LB_HEADER = ["Date", "Name", "Year", "Letterboxd URI", "Rating", "Rewatch", "Tags", "Watched Date"]
+
+
+def diary_rows(n: int, seed: int = 7):
+    """n diary-like dicts: title, year, watched (date), rating (0.5-5 or None), rewatch, uri."""
+    rng = random.Random(seed)
+    seen = []
+    start = date(2012, 1, 1)
+    for i in range(n):
+        if seen and rng.random() < 0.3:
+            title, year = rng.choice(seen)
+            rewatch = True
+        else:
+            words = rng.sample(WORDS, rng.randint(1, 4))
+            title = " ".join(w.capitalize() for w in words)
+            if rng.random() < 0.2:
+                title = "The " + title
+            year = rng.randint(1950, 2024)
+            seen.append((title, year))
+            rewatch = False
+        yield {
+            "title": title,
+            "year": year,
+            "watched": start + timedelta(days=i * 4000 // max(n, 1)),
+            "rating": rng.choice([None, 0.5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 4.5, 5]),
+            "rewatch": rewatch,
+            "uri": f"https://boxd.it/{seed:x}-{i:x}",  # distinct per seed: no accidental re-imports
+        }
+
+
+def write_letterboxd_csv(n: int, path: str, seed: int = 7) -> str:
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(LB_HEADER)
+        for r in diary_rows(n, seed):
+            d = r["watched"].isoformat()
+            w.writerow([d, r["title"], r["year"], r["uri"],
+                        "" if r["rating"] is None else r["rating"],
+                        "Yes" if r["rewatch"] else "", "", d])
+    return path
+
+
+def diary_entry_dicts(n: int, seed: int = 7, posters: bool = True):
+    """Rows ready for a Core insert into diary_entries."""
+    now = datetime.utcnow()
+    for i, r in enumerate(diary_rows(n, seed)):
+        yield {
+            "external_id": f"letterboxd:{r['uri']}",
+            "kind": "movie",
+            "title": r["title"],
+            "poster_url": f"https://image.tmdb.org/t/p/w500/{i:x}.jpg" if posters else None,
+            "date_watched": r["watched"],
+            "rating": int(r["rating"] * 2) if r["rating"] else None,
+            "review": "Rewatch" if r["rewatch"] else None,
+            "release_year": r["year"],
+            "created_at": now,
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "csv":
+        sys.exit(__doc__)
+    print(write_letterboxd_csv(int(sys.argv[2]), sys.argv[3]))
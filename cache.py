@@ -0,0 +1,155 @@
+import json, os, sqlite3, threading, time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # only needed for a redis:// cache URL
+    redis = None
+
+
+class ResponseCache:
+    """Two-tier cache for JSON API responses.
+
+    Tier 1 is an in-process LRU dict, tier 2 an optional SQLite file or Redis
+    server, so entries survive restarts and are shared by every worker process.
+    Entries are stored with the time they were written; the caller decides what
+    counts as fresh/stale via `get(key, ttl, stale_ttl)`. With `max_age` set,
+    tier-2 entries older than that are dropped (Redis expiry / periodic DELETE).
+    """
+
+    PRUNE_EVERY = 500  # sets between SQLite prunes
+
+    def __init__(self, path: str | None = None, max_items: int = 512,
+                 redis_url: str | None = None, prefix: str = "", max_age: float | None = None):
+        self.path = path
+        self.max_items = max_items
+        self.prefix = prefix
+        self.max_age = max_age
+        self._mem: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sets = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._redis = None
+        if redis_url:
+            if redis is None:
+                raise RuntimeError("A redis:// cache URL needs the redis package (pip install redis).")
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+        elif path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._conn() as c:
+                c.execute("CREATE TABLE IF NOT EXISTS http_cache ("
+                          "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)")
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads, keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            # WAL: worker processes read while another one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, stored_at, value):
+        with self._lock:
+            self._mem[key] = (stored_at, value)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                self._mem.move_to_end(key)
+                return hit
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(self.prefix + key)
+            except redis.RedisError:
+                return None
+            if raw is None:
+                return None
+            stored_at, value = json.loads(raw)
+        elif self.path:
+            try:
+                row = self._conn().execute(
+                    "SELECT stored_at, value FROM http_cache WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None:
+                return None
+            stored_at, value = row[0], json.loads(row[1])
+        else:
+            return None
+        self._remember(key, stored_at, value)
+        return stored_at, value
+
+    def get(self, key: str, ttl: float, stale_ttl: float = 0):
+        """Return (value, is_stale) or None.
+
+        Fresh means younger than `ttl`; stale means younger than
+        `ttl + stale_ttl` and should be served while a refresh happens.
+        """
+        hit = self._lookup(key)
+        if hit is None:
+            self.misses += 1
+            return None
+        stored_at, value = hit
+        age = time.time() - stored_at
+        if age <= ttl:
+            self.hits += 1
+            return value, False
+        if age <= ttl + stale_ttl:
+            self.stale_hits += 1
+            return value, True
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value):
+        now = time.time()
+        self._remember(key, now, value)
+        if self._redis is not None:
+            try:
+                self._redis.set(self.prefix + key, json.dumps([now, value]),
+                                ex=int(self.max_age) if self.max_age else None)
+            except redis.RedisError:
+                pass  # shared tier is best-effort
+            return
+        if not self.path:
+            return
+        with self._lock:
+            self._sets += 1
+            prune = self.max_age is not None and self._sets % self.PRUNE_EVERY == 0
+        try:
+            with self._conn() as c:
+                c.execute("INSERT OR REPLACE INTO http_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                          (key, json.dumps(value), now))
+                if prune:
+                    c.execute("DELETE FROM http_cache WHERE stored_at < ?", (now - self.max_age,))
+        except sqlite3.Error:
+            pass  # disk tier is best-effort
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+        if self._redis is not None:
+            for k in self._redis.scan_iter(match=self.prefix + "*"):
+                self._redis.delete(k)
+        elif self.path:
+            with self._conn() as c:
+                c.execute("DELETE FROM http_cache")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self._mem),
+        }
@@ -0,0 +1,104 @@
+"""Objects shared by the app factory and the blueprints.
+
+`db` is bound in create_app(). The TMDb client, its batch runner, the title
+index and the poster cache are built the first time something touches them
+(see lazy()), so DB-only CLI commands never need TMDb credentials and a
+worker boots without the requests stack, thread pools or cache files it may
+not use yet.
+"""
+import os
+import threading
+
+from flask import current_app
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
+
+from cache import ResponseCache
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+db = SQLAlchemy()
+
+# Caches that should hold across worker processes: a redis:// CACHE_URL puts
+# them in Redis, otherwise they share SQLite files under instance/;
+# CACHE_URL="" keeps them in process memory only.
+CACHE_URL = os.environ.get("CACHE_URL", "sqlite")
+
+
+def make_cache(name: str, max_items: int = 512, max_age: float | None = None,
+               path: str | None = None) -> ResponseCache:
+    if CACHE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return ResponseCache(max_items=max_items, redis_url=CACHE_URL, prefix=f"maxi:{name}:",
+                             max_age=max_age)
+    if CACHE_URL and path != "":
+        path = path or os.path.join(BASE_DIR, "instance", f"{name}_cache.db")
+        return ResponseCache(path, max_items=max_items, max_age=max_age)
+    return ResponseCache(max_items=max_items)
+
+
+# --- Lazily built objects ---
+# RLock: one factory may touch another lazy object (tmdb_batch -> tmdb)
+_lazy_lock = threading.RLock()
+
+
+def lazy(name: str, factory):
+    """Proxy to a per-app object, built by factory(app) on first use.
+
+    Lives in app.extensions[name]; the proxy works anywhere an app context is
+    pushed (requests, CLI commands, background threads).
+    """
+    def get():
+        app = current_app._get_current_object()
+        try:
+            return app.extensions[name]
+        except KeyError:
+            pass
+        with _lazy_lock:
+            if name not in app.extensions:
+                app.extensions[name] = factory(app)
+            return app.extensions[name]
+    return LocalProxy(get)
+
+
+def _make_tmdb(app):
+    from tmdb import TMDBClient, RateLimiter
+    client = TMDBClient(
+        bearer=os.environ.get("TMDB_BEARER"),
+        api_key=os.environ.get("TMDB_API_KEY"),
+        # set TMDB_CACHE_PATH="" to keep the cache in memory only
+        cache=make_cache("tmdb", max_age=31 * 24 * 3600,
+                         path=os.environ.get("TMDB_CACHE_PATH", os.path.join(app.instance_path, "tmdb_cache.db"))),
+        pool_size=int(os.environ.get("TMDB_POOL_SIZE", "10")),
+        # TMDb's limit is per IP, so split it across worker processes
+        rate_limiter=RateLimiter(rate=float(os.environ.get("TMDB_RATE_LIMIT", "35"))
+                                 / max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))),
+    )
+    client.observers.extend(app.extensions.get("tmdb_observers", ()))
+    return client
+
+
+def _make_tmdb_batch(app):
+    from tmdb_async import AsyncTMDBClient, TMDBBatchRunner
+    return TMDBBatchRunner(AsyncTMDBClient(tmdb._get_current_object()))
+
+
+def _make_title_index(app):
+    from title_index import TitleIndex
+    return TitleIndex(os.environ.get("TITLE_INDEX_PATH", os.path.join(BASE_DIR, "instance", "title_index.db")))
+
+
+def _make_poster_cache(app):
+    from poster_cache import PosterCache
+    return PosterCache(
+        os.environ.get("POSTER_CACHE_DIR", os.path.join(BASE_DIR, "instance", "posters")),
+        max_bytes=int(os.environ.get("POSTER_CACHE_MB", "200")) * 1024 * 1024,
+    )
+
+
+tmdb = lazy("tmdb", _make_tmdb)
+# bulk paths (import, backfill) fan out through this; shares tmdb's pool + limiter
+tmdb_batch = lazy("tmdb_batch", _make_tmdb_batch)
+# offline title -> id/poster lookups, tried before any search (see index-titles)
+title_index = lazy("title_index", _make_title_index)
+# Poster thumbnails are proxied and cached on disk instead of hot-linking w500 JPEGs
+poster_cache = lazy("poster_cache", _make_poster_cache)
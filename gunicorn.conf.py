@@ -0,0 +1,27 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}"
+
+# SQLite takes one writer at a time, so a few processes with a handful of
+# threads each beats many single-threaded workers. WEB_CONCURRENCY is also read
+# by the app to split TMDB_RATE_LIMIT between workers.
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 4)))
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", "4"))  # keep DB_POOL_SIZE above this
+
+timeout = 120          # uploads are staged to disk inside the request
+graceful_timeout = 30
+keepalive = 5
+
+# Deliberately not set:
+#   preload_app  - safe since clients and caches are built lazily, after the
+#                  fork, and it makes worker spawns cheaper; but then a HUP
+#                  reload doesn't pick up new code. GUNICORN_CMD_ARGS=--preload
+#                  to opt in.
+#   max_requests - imports run in a background thread of the worker that took
+#                  the upload; recycling that worker would kill the import
+accesslog = os.environ.get("ACCESS_LOG", "-") or None
+errorlog = "-"
@@ -0,0 +1,149 @@
+import hashlib
+import os
+from functools import lru_cache, wraps
+
+from flask import Response, current_app, request
+from werkzeug.http import is_resource_modified
+
+from extensions import db, lazy, make_cache
+from models import DiaryEntry, Title, diary_state
+
+# --- HTTP caching ---
+# Pages and API responses that only change when the diary does get a weak ETag
+# built from the diary version (see DiaryState) plus a Last-Modified, so a
+# revalidation is one tiny SELECT and a 304. Static files are linked as
+# /static/...?v=<content hash> and served immutable.
+_tree_hashes: dict[str, str] = {}
+
+
+def _tree_hash(*folders) -> str:
+    """Short hash over every file under `folders` (computed once per process)."""
+    key = "|".join(folders)
+    if key not in _tree_hashes:
+        h = hashlib.sha256()
+        for folder in folders:
+            for dirpath, dirnames, names in sorted(os.walk(folder)):
+                dirnames.sort()
+                for n in sorted(names):
+                    path = os.path.join(dirpath, n)
+                    h.update(os.path.relpath(path, folder).encode())
+                    with open(path, "rb") as fh:
+                        h.update(fh.read())
+        _tree_hashes[key] = h.hexdigest()[:12]
+    return _tree_hashes[key]
+
+
+def asset_version() -> str:
+    return _tree_hash(current_app.static_folder)
+
+
+def build_version() -> str:
+    # rendered pages depend on the templates and on the static URLs they embed
+    return _tree_hash(current_app.static_folder,
+                      os.path.join(current_app.root_path, current_app.template_folder))
+
+
+@lru_cache(maxsize=256)
+def _file_hash(path: str, mtime: float) -> str:
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()[:10]
+
+
+def static_file_hash(filename: str) -> str | None:
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        return _file_hash(path, os.path.getmtime(path))
+    except OSError:
+        return None
+
+
+def _fingerprint_static(endpoint, values):
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        v = static_file_hash(values["filename"])
+        if v:
+            values["v"] = v
+
+
+def _static_cache_headers(resp):
+    # only a URL whose ?v= matches the file on disk may be cached forever
+    if (request.endpoint == "static" and resp.status_code in (200, 304)
+            and request.args.get("v")
+            and request.args["v"] == static_file_hash(request.view_args.get("filename", ""))):
+        resp.cache_control.public = True
+        resp.cache_control.max_age = 365 * 24 * 3600
+        resp.cache_control.immutable = True
+        resp.cache_control.no_cache = None
+    return resp
+
+
+def diary_validator(**_):
+    version, changed_at = diary_state()
+    return f"d{version}", changed_at
+
+
+def entry_validator(entry_id, **_):
+    # a single entry only changes when its own row does
+    updated_at = db.session.scalar(db.select(DiaryEntry.updated_at).where(DiaryEntry.id == entry_id))
+    return (f"e{entry_id}-{updated_at:%Y%m%d%H%M%S%f}", updated_at) if updated_at else None
+
+
+def title_validator(kind, item_id, **_):
+    # stored titles change when they're (re)fetched; unstored ones aren't cached
+    kind = "movie" if kind == "movie" else "series"
+    fetched_at = db.session.scalar(
+        db.select(Title.fetched_at).filter_by(kind=kind, tmdb_id=item_id))
+    return (f"t{int(fetched_at.timestamp())}", fetched_at) if fetched_at else None
+
+
+# Rendered pages keyed by (ETag, URL): a new diary version simply stops
+# matching, so writes invalidate without any bookkeeping. PAGE_CACHE_ITEMS=0
+# turns it off.
+PAGE_CACHE_ITEMS = int(os.environ.get("PAGE_CACHE_ITEMS", "256"))
+page_cache = lazy("page_cache", lambda app: (make_cache("pages", PAGE_CACHE_ITEMS, max_age=24 * 3600)
+                                             if PAGE_CACHE_ITEMS > 0 else None))
+
+
+def conditional(validator, fragment=False):
+    """Serve a GET view with a weak ETag / Last-Modified from `validator`.
+
+    `validator(**view_args)` returns (tag, last_modified) or None to skip
+    caching. Matching If-None-Match / If-Modified-Since answers 304 before
+    the view runs; with fragment=True the rendered body is also kept in
+    page_cache.
+    """
+    def deco(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            v = validator(**kwargs)
+            if v is None:
+                return view(*args, **kwargs)
+            tag, modified = v
+            etag = f"{request.endpoint}-{tag}-{build_version()}"
+            if modified is not None:
+                modified = modified.replace(microsecond=0)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=modified):
+                resp = Response(status=304)
+            else:
+                key = f"{etag}|{request.full_path}"
+                hit = page_cache.get(key, ttl=float("inf")) if fragment and page_cache else None
+                if hit:
+                    mimetype, body = hit[0]
+                    resp = Response(body, mimetype=mimetype)
+                else:
+                    resp = current_app.make_response(view(*args, **kwargs))
+                    if resp.status_code != 200:
+                        return resp
+                    if fragment and page_cache:
+                        page_cache.set(key, (resp.mimetype, resp.get_data(as_text=True)))
+            resp.set_etag(etag, weak=True)
+            if modified is not None:
+                resp.last_modified = modified
+            resp.cache_control.no_cache = True  # always revalidate, it's cheap
+            return resp
+        return wrapper
+    return deco
+
+
+def init_app(app):
+    app.url_defaults(_fingerprint_static)
+    app.after_request(_static_cache_headers)
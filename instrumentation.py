@@ -0,0 +1,125 @@
+import os
+import time
+
+from flask import Response, before_render_template, current_app, g, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from metrics import Registry, RequestStats, current as current_request_stats
+
+# --- Instrumentation ---
+# Every request collects where its time went (SQL, TMDb, templates). That goes
+# out as a Server-Timing header and into the slow-request log; aggregates are
+# on /metrics in Prometheus text format.
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "500"))
+
+registry = Registry()
+http_requests = registry.counter(
+    "maxi_http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+http_latency = registry.histogram(
+    "maxi_http_request_duration_seconds", "Request latency.", ("method", "route"))
+request_sql = registry.histogram(
+    "maxi_http_request_sql_queries", "SQL statements per request.", ("route",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 500))
+sql_latency = registry.histogram(
+    "maxi_sql_query_duration_seconds", "SQL statement latency.")
+tmdb_requests = registry.counter(
+    "maxi_tmdb_requests_total", "TMDb client calls by cache outcome and upstream status.",
+    ("endpoint", "cache", "status"))
+tmdb_latency = registry.histogram(
+    "maxi_tmdb_request_duration_seconds", "TMDb client call latency, cache included.", ("endpoint",))
+cache_stats = registry.gauge("maxi_cache", "Cache counters.", ("cache", "stat"))
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+    ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    sql_latency.observe(ms / 1000)
+    st = current_request_stats.get()
+    if st is not None:
+        st.sql_count += 1
+        st.sql_ms += ms
+
+
+@event.listens_for(Engine, "handle_error")
+def _sql_failed(ctx):
+    started = ctx.connection.info.get("query_started") if ctx.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _tmdb_observed(name, ms, info):
+    tmdb_requests.inc(endpoint=name, cache=info["cache"], status=info["status"] or "")
+    tmdb_latency.observe(ms / 1000, endpoint=name)
+    st = current_request_stats.get()
+    if st is not None:
+        st.tmdb_count += 1
+        st.tmdb_ms += ms
+
+
+def _render_started(sender, template, context, **extra):
+    st = current_request_stats.get()
+    if st is not None:
+        st.render_started = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    st = current_request_stats.get()
+    if st is not None and st.render_started is not None:
+        st.render_ms += (time.perf_counter() - st.render_started) * 1000
+        st.render_started = None
+
+
+def _start_request_stats():
+    g.request_stats = RequestStats()
+    current_request_stats.set(g.request_stats)
+
+
+def _record_request_stats(resp):
+    st = g.pop("request_stats", None)
+    if st is None:
+        return resp
+    ms = st.elapsed_ms()
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    http_requests.inc(method=request.method, route=route, status=resp.status_code)
+    http_latency.observe(ms / 1000, method=request.method, route=route)
+    request_sql.observe(st.sql_count, route=route)
+    resp.headers["Server-Timing"] = st.server_timing(ms)
+    if ms >= SLOW_REQUEST_MS:
+        current_app.logger.warning("Slow request: %s %s -> %s in %.0fms (%s)",
+                           request.method, request.full_path.rstrip("?"), resp.status_code, ms, st.summary())
+    return resp
+
+
+def _clear_request_stats(exc):
+    # worker threads get reused; don't let the next request inherit this one
+    current_request_stats.set(None)
+
+
+def metrics():
+    # only caches something has used so far; the rest have nothing to report
+    ext = current_app.extensions
+    caches = (("tmdb", getattr(ext.get("tmdb"), "cache", None)),
+              ("pages", ext.get("page_cache")), ("suggest", ext.get("suggest_cache")))
+    for name, c in caches:
+        if c is None:
+            continue
+        for stat, v in c.stats().items():
+            cache_stats.set(v, cache=name, stat=stat)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    # the TMDb client is built lazily (extensions.tmdb) and picks these up then
+    app.extensions.setdefault("tmdb_observers", []).append(_tmdb_observed)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    app.before_request(_start_request_stats)
+    app.after_request(_record_request_stats)
+    app.teardown_request(_clear_request_stats)
+    app.add_url_rule("/metrics", view_func=metrics)
@@ -0,0 +1,95 @@
+"""Title matching for poster backfill and Letterboxd import.
+
+One normalizer and one scorer shared by every path that has to pick a TMDb
+search hit for a diary title.
+"""
+import re
+from functools import lru_cache
+
+_PARENS = re.compile(r"\(.*?\)")
+_NON_ALNUM = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+EXACT_BONUS = 0.5      # exact normalized title (+ year when we have one)
+YEAR_BONUS = 0.20      # same release year
+NEAR_YEAR_BONUS = 0.05  # off by one (festival vs. wide release, etc.)
+
+
+@lru_cache(maxsize=65536)
+def norm_title(s: str) -> str:
+    """Lowercase, strip accents, parentheticals and punctuation; '&' -> 'and'."""
+    if not s:
+        return ""
+    import unicodedata  # deferred, like difflib below: keeps importing this module cheap
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(c for c in s if not unicodedata.category(c).startswith("M"))
+    s = s.lower()
+    s = _PARENS.sub("", s)                # drop parentheticals
+    s = s.replace("&", "and")
+    s = _NON_ALNUM.sub(" ", s)            # strip punctuation
+    s = _SPACES.sub(" ", s).strip()
+    return s
+
+
+def year_bonus(year_q: int | None, year_hit: int | None) -> float:
+    if year_q and year_hit:
+        if year_q == year_hit:
+            return YEAR_BONUS
+        if abs(year_q - year_hit) == 1:
+            return NEAR_YEAR_BONUS
+    return 0.0
+
+
+def score(title_q: str, title_hit: str, year_q: int | None, year_hit: int | None) -> float:
+    """Title similarity + small year bonus (exact=+0.2, off by 1=+0.05)."""
+    from difflib import SequenceMatcher
+    t = SequenceMatcher(None, norm_title(title_q), norm_title(title_hit)).ratio()
+    return t + year_bonus(year_q, year_hit)
+
+
+def best_match(title: str, year: int | None, candidates, key_title="title", key_year="year"):
+    """Pick the best candidate dict for `title`/`year` -> (candidate, score).
+
+    Same result as scoring every candidate with score() (+EXACT_BONUS for an
+    exact title/year hit) and keeping the first highest, but cheaper:
+    normalization is memoized, candidates whose quick upper bound can't beat
+    the current best skip the full ratio, and an exact title+year hit ends
+    the search since nothing can outscore it.
+    """
+    from difflib import SequenceMatcher
+    q = norm_title(title)
+    sm = SequenceMatcher(None, q, "")
+    best, best_score = None, 0.0
+    for c in candidates:
+        hit_year = c.get(key_year)
+        n = norm_title(c.get(key_title) or "")
+        bonus = year_bonus(year, hit_year)
+        if n == q:
+            s = 1.0 + bonus
+            if not year or hit_year == year:
+                s += EXACT_BONUS
+                if best is None or s > best_score:
+                    return c, s  # maximum possible score; first one wins ties
+        else:
+            sm.set_seq2(n)
+            # ratio() <= quick_ratio() <= real_quick_ratio()
+            if sm.real_quick_ratio() + bonus <= best_score or sm.quick_ratio() + bonus <= best_score:
+                continue
+            s = sm.ratio() + bonus
+        if s > best_score:
+            best, best_score = c, s
+    return best, best_score
+
+
+def pick_exact_or_first(results, title: str, key_title="title", require="poster_path"):
+    """Exact normalized-title hit that has `require`, else the first that has it."""
+    q = norm_title(title)
+    first = None
+    for r in results:
+        if not r.get(require):
+            continue
+        if norm_title(r.get(key_title) or r.get("name") or "") == q:
+            return r
+        if first is None:
+            first = r
+    return first
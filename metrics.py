@@ -0,0 +1,142 @@
+import bisect, threading, time
+from contextvars import ContextVar
+
+# seconds; roughly doubling from 5ms to 10s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names, values, extra=""):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_num(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(round(v, 6)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_fmt_labels(self.labels, key)} {_fmt_num(v)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, Prometheus style (_bucket/_sum/_count)."""
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, list] = {}  # key -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in items:
+            cum = 0
+            for bound, n in zip((*self.buckets, float("inf")), row):
+                cum += n
+                le = f'le="{_fmt_num(bound)}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cum}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, key)} {_fmt_num(row[-1])}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, key)} {cum}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *a, **kw) -> Counter:
+        return self._add(Counter(*a, **kw))
+
+    def gauge(self, *a, **kw) -> Gauge:
+        return self._add(Gauge(*a, **kw))
+
+    def histogram(self, *a, **kw) -> Histogram:
+        return self._add(Histogram(*a, **kw))
+
+    def _add(self, m):
+        self._metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format (0.0.4)."""
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+class RequestStats:
+    """Where one request's time went; lives in `current` for the request's duration."""
+
+    __slots__ = ("started", "sql_count", "sql_ms", "tmdb_count", "tmdb_ms", "render_ms", "render_started")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.tmdb_count = 0
+        self.tmdb_ms = 0.0
+        self.render_ms = 0.0
+        self.render_started = None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms: float) -> str:
+        return (f'app;dur={total_ms:.1f}, '
+                f'db;desc="{self.sql_count} queries";dur={self.sql_ms:.1f}, '
+                f'tmdb;desc="{self.tmdb_count} calls";dur={self.tmdb_ms:.1f}, '
+                f'tpl;dur={self.render_ms:.1f}')
+
+    def summary(self) -> str:
+        return (f"sql {self.sql_count}q/{self.sql_ms:.0f}ms, "
+                f"tmdb {self.tmdb_count} calls/{self.tmdb_ms:.0f}ms, "
+                f"render {self.render_ms:.0f}ms")
+
+
+# background threads (imports, refreshes) start with no RequestStats and aren't attributed
+current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
@@ -0,0 +1,420 @@
+"""Versioned schema migrations.
+
+    flask --app app.py db-upgrade              # apply whatever is pending (init-db does the same)
+    flask --app app.py db-upgrade --sql        # print the SQL instead; no database needed
+    flask --app app.py db-current | db-history | db-stamp N | db-check
+
+Migrations are numbered and run in order, one transaction each; the version a
+database is at lives in schema_version. A migration returns the statements
+for one dialect, so `--sql` can render a script for a DBA without connecting.
+Tables are written out as they were at that version instead of being taken
+from models.py, so an old migration keeps producing the same DDL.
+
+Databases made before this (create_all() plus the old migrate-* commands) are
+brought up to the baseline by the first db-upgrade and stamped.
+"""
+from datetime import date, datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import (Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+                        Text, UniqueConstraint, func, inspect, select, text)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from extensions import db
+from models import _FTS_PG, _FTS_SQLITE, rebuild_stats
+
+MIGRATIONS: list[tuple[int, str, object]] = []  # (version, description, steps(dialect) -> [statements])
+
+
+def migration(version: int, description: str):
+    def deco(steps):
+        assert version == len(MIGRATIONS) + 1, "migrations are numbered 1, 2, 3, ..."
+        MIGRATIONS.append((version, description, steps))
+        return steps
+    return deco
+
+
+def head() -> int:
+    return MIGRATIONS[-1][0]
+
+
+# --- Migrations ---
+# Schema as of the first versioned release, i.e. what create_all() used to make.
+_v1 = MetaData()
+
+Table("diary_entries", _v1,
+      Column("id", Integer, primary_key=True),
+      Column("external_id", String(128), nullable=False),
+      Column("kind", String(16), nullable=False),
+      Column("title", String(256), nullable=False),
+      Column("poster_url", String(512)),
+      Column("date_watched", Date),
+      Column("rating", Integer),
+      Column("review", Text),
+      Column("release_year", Integer),
+      Column("tmdb_id", Integer, index=True),
+      Column("created_at", DateTime, nullable=False),
+      Index("ix_diary_order", "date_watched", "created_at", "id"),
+      Index("uq_diary_import_key", "external_id", "date_watched", unique=True,
+            sqlite_where=text("external_id LIKE 'letterboxd:%'"),
+            postgresql_where=text("external_id LIKE 'letterboxd:%'")))
+
+Table("titles", _v1,
+      Column("id", Integer, primary_key=True),
+      Column("kind", String(16), nullable=False),
+      Column("tmdb_id", Integer, nullable=False),
+      Column("title", String(256), nullable=False),
+      Column("poster_url", String(512)),
+      Column("overview", Text),
+      Column("year", String(4)),
+      Column("status", String(64)),
+      Column("runtime", Integer),
+      Column("vote_average", Float),
+      Column("fetched_at", DateTime, nullable=False),
+      UniqueConstraint("kind", "tmdb_id", name="uq_titles_kind_tmdb"))
+
+Table("title_genres", _v1,
+      Column("title_id", Integer, ForeignKey("titles.id", ondelete="CASCADE"), primary_key=True),
+      Column("position", Integer, primary_key=True),
+      Column("name", String(64), nullable=False, index=True))
+
+Table("title_studios", _v1,
+      Column("title_id", Integer, ForeignKey("titles.id", ondelete="CASCADE"), primary_key=True),
+      Column("position", Integer, primary_key=True),
+      Column("name", String(128), nullable=False))
+
+Table("title_credits", _v1,
+      Column("title_id", Integer, ForeignKey("titles.id", ondelete="CASCADE"), primary_key=True),
+      Column("position", Integer, primary_key=True),
+      Column("person_id", Integer, index=True),
+      Column("name", String(256)),
+      Column("character", String(256)),
+      Column("photo_url", String(512)))
+
+Table("diary_state", _v1,
+      Column("id", Integer, primary_key=True),
+      Column("version", Integer, nullable=False),
+      Column("changed_at", DateTime, nullable=False))
+
+Table("diary_stats", _v1,
+      Column("period", String(16), primary_key=True),
+      Column("metric", String(16), primary_key=True),
+      Column("bucket", Integer, primary_key=True),
+      Column("n", Integer, nullable=False),
+      Column("total", Integer, nullable=False))
+
+Table("import_jobs", _v1,
+      Column("id", String(32), primary_key=True),
+      Column("filename", String(256)),
+      Column("status", String(16), nullable=False),
+      Column("mode", String(16), nullable=False),
+      Column("rows_parsed", Integer, nullable=False),
+      Column("rows_resolved", Integer, nullable=False),
+      Column("rows_inserted", Integer, nullable=False),
+      Column("rows_updated", Integer, nullable=False),
+      Column("rows_skipped", Integer, nullable=False),
+      Column("rows_failed", Integer, nullable=False),
+      Column("error", Text),
+      Column("created_at", DateTime, nullable=False),
+      Column("finished_at", DateTime))
+
+
+@migration(1, "baseline: diary, titles, stats, import jobs, full-text search")
+def _baseline(dialect):
+    # IF NOT EXISTS throughout, so it also fills the gaps of a pre-migrations database
+    out = [CreateTable(t, if_not_exists=True) for t in _v1.sorted_tables]
+    out += [CreateIndex(ix, if_not_exists=True)
+            for t in _v1.sorted_tables for ix in sorted(t.indexes, key=lambda ix: ix.name)]
+    if dialect == "sqlite":
+        out += [*_FTS_SQLITE, "INSERT INTO diary_fts(diary_fts) VALUES ('rebuild')"]
+    elif dialect == "postgresql":
+        out += _FTS_PG
+    return out
+
+
+@migration(2, "diary_entries.updated_at; indexes for latest entries and missing posters")
+def _updated_at_and_indexes(dialect):
+    out = [f"ALTER TABLE diary_entries ADD COLUMN updated_at {DateTime().compile(dialect=_dialect(dialect))}",
+           "UPDATE diary_entries SET updated_at = created_at",
+           # the home page's latest entries
+           "CREATE INDEX ix_diary_created ON diary_entries (created_at)",
+           # backfill-posters walks these by id; usually a small slice of the diary
+           "CREATE INDEX ix_diary_missing_poster ON diary_entries (id) "
+           "WHERE poster_url IS NULL OR poster_url = ''"]
+    if dialect == "postgresql":
+        # pages sort undated entries last, which a backward scan of the
+        # ascending index can't give (it returns NULLs first)
+        out += ["DROP INDEX ix_diary_order",
+                "CREATE INDEX ix_diary_order ON diary_entries "
+                "(date_watched DESC NULLS LAST, created_at DESC, id DESC)"]
+    return out
+
+
+# --- Runner ---
+# for --sql; a named paramstyle keeps LIKE '...%' from being escaped to %%
+_DIALECTS = {"sqlite": sqlite.dialect(), "postgresql": postgresql.dialect(paramstyle="named")}
+
+schema_version = Table("schema_version", MetaData(), Column("version", Integer, nullable=False))
+
+
+def _dialect(name: str):
+    if name in _DIALECTS:
+        return _DIALECTS[name]
+    return db.engine.dialect
+
+
+def _pending(start: int, target: int | None):
+    target = head() if target is None else target
+    return [m for m in MIGRATIONS if start < m[0] <= target]
+
+
+def current_version(conn) -> int | None:
+    """Version the database is at; None when it isn't versioned (new or pre-migrations)."""
+    if not inspect(conn).has_table("schema_version"):
+        return None
+    return conn.scalar(select(func.max(schema_version.c.version))) or 0
+
+
+def _stamp(conn, version: int):
+    schema_version.create(conn, checkfirst=True)
+    conn.execute(schema_version.delete())
+    conn.execute(schema_version.insert().values(version=version))
+
+
+def _run(conn, stmt):
+    conn.execute(text(stmt) if isinstance(stmt, str) else stmt)
+
+
+def _begin(conn):
+    # pysqlite only opens a transaction before DML, so DDL would autocommit
+    # statement by statement; start one explicitly to keep migrations atomic
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN")
+
+
+def _adopt_legacy(conn, dedupe: bool):
+    """Bring a create_all() database up to the baseline's columns before stamping it."""
+    insp = inspect(conn)
+    cols = {c["name"] for c in insp.get_columns("diary_entries")}
+    for col in ("release_year", "tmdb_id"):
+        if col not in cols:
+            conn.execute(text(f"ALTER TABLE diary_entries ADD COLUMN {col} INTEGER"))
+            print(f"Added diary_entries.{col}.")
+    if "tmdb_id" not in cols:
+        rows = conn.execute(text("SELECT id, external_id FROM diary_entries WHERE tmdb_id IS NULL"))
+        linked = [{"i": i, "t": int(ext)} for i, ext in rows if ext and ext.isdigit()]
+        if linked:
+            conn.execute(text("UPDATE diary_entries SET tmdb_id = :t WHERE id = :i"), linked)
+        print(f"Linked {len(linked)} entries to their TMDb ids.")
+
+    if insp.has_table("import_jobs"):
+        job_cols = {c["name"] for c in insp.get_columns("import_jobs")}
+        for col, ddl in (("mode", "VARCHAR(16) NOT NULL DEFAULT 'skip'"),
+                         ("rows_updated", "INTEGER NOT NULL DEFAULT 0"),
+                         ("rows_skipped", "INTEGER NOT NULL DEFAULT 0")):
+            if col not in job_cols:
+                conn.execute(text(f"ALTER TABLE import_jobs ADD COLUMN {col} {ddl}"))
+                print(f"Added import_jobs.{col}.")
+
+    if "uq_diary_import_key" not in {i["name"] for i in insp.get_indexes("diary_entries")}:
+        # GROUP BY treats NULL dates as equal, which is what we want here
+        dupes = [r[0] for r in conn.execute(text("""
+            SELECT id FROM diary_entries
+            WHERE external_id LIKE 'letterboxd:%' AND id NOT IN (
+                SELECT MIN(id) FROM diary_entries
+                WHERE external_id LIKE 'letterboxd:%'
+                GROUP BY external_id, date_watched)"""))]
+        if dupes and not dedupe:
+            raise click.ClickException(
+                f"{len(dupes)} duplicate imported rows block uq_diary_import_key; "
+                "re-run with --dedupe to remove them (keeps the oldest).")
+        if dupes:
+            conn.execute(text("DELETE FROM diary_entries WHERE id = :i"), [{"i": i} for i in dupes])
+            print(f"Removed {len(dupes)} duplicate rows.")
+
+
+def upgrade(target: int | None = None, dedupe: bool = False) -> list[tuple[int, str]]:
+    """Apply pending migrations up to `target` (default: all); returns what ran."""
+    with db.engine.connect() as conn:
+        version = current_version(conn)
+        legacy = version is None and inspect(conn).has_table("diary_entries")
+    if legacy:
+        print("Unversioned database found; adopting it at version 1.")
+        with db.engine.begin() as conn:
+            _begin(conn)
+            _adopt_legacy(conn, dedupe)
+            for stmt in _baseline(conn.dialect.name):
+                _run(conn, stmt)
+            # diary_stats may be new or stale; writes from here on only apply deltas
+            print(f"Rebuilt {rebuild_stats(conn)} stats rows.")
+            _stamp(conn, 1)
+        version = 1
+    done = []
+    for v, description, steps in _pending(version or 0, target):
+        with db.engine.begin() as conn:
+            _begin(conn)
+            for stmt in steps(conn.dialect.name):
+                _run(conn, stmt)
+            _stamp(conn, v)
+        done.append((v, description))
+    return done
+
+
+def upgrade_sql(start: int, target: int | None, dialect: str) -> str:
+    """The upgrade as a SQL script, rendered without a database connection."""
+    d = _dialect(dialect)
+    lines = [str(CreateTable(schema_version, if_not_exists=True).compile(dialect=d)).strip() + ";"]
+    for v, description, steps in _pending(start, target):
+        lines += ["", f"-- {v}: {description}", "BEGIN;"]
+        for stmt in steps(dialect):
+            lines.append((stmt if isinstance(stmt, str) else str(stmt.compile(dialect=d))).strip() + ";")
+        lines += ["DELETE FROM schema_version;", f"INSERT INTO schema_version (version) VALUES ({v});", "COMMIT;"]
+    return "\n".join(lines)
+
+
+# --- Index check ---
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN <select>; the plan comes back as rows."""
+    inherit_cache = False
+
+    def __init__(self, stmt):
+        self.stmt = stmt
+
+
+@compiles(_Explain)
+def _explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.stmt, **kw)
+
+
+@compiles(_Explain, "sqlite")
+def _explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.stmt, **kw)
+
+
+def _hot_queries():
+    """(label, statement, index it must use, seek), built by the same code the views run.
+
+    seek: the query has a bound on the index (keyset pages, lookups), so reading
+    the index from one end and filtering doesn't count.
+    """
+    from models import DiaryEntry
+    from views.diary import _diary_page_queries, _encode_cursor, _latest_query
+    from views.imports import _existing_import_query, _missing_posters_query
+    now = datetime.utcnow()
+    first, undated = _diary_page_queries([DiaryEntry])
+    after, _ = _diary_page_queries([DiaryEntry], _encode_cursor(date.today(), now, 1))
+    (undated_after,) = _diary_page_queries([DiaryEntry], _encode_cursor(None, now, 1))
+    return [
+        ("diary page", first.limit(51), "ix_diary_order", True),
+        ("diary page after cursor", after.limit(51), "ix_diary_order", True),
+        ("undated tail", undated.limit(51), "ix_diary_order", True),
+        ("undated tail after cursor", undated_after.limit(51), "ix_diary_order", True),
+        ("latest entries", _latest_query(), "ix_diary_created", False),
+        ("backfill batch", _missing_posters_query(0).limit(200), "ix_diary_missing_poster", True),
+        ("import lookup", _existing_import_query({"letterboxd:https://boxd.it/x"}), "uq_diary_import_key", True),
+    ]
+
+
+def explain(stmt) -> str:
+    """The database's plan for `stmt`, one line per step."""
+    with db.engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # small or empty tables get sequential scans whatever the indexes are
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        return "\n".join(str(r[-1]) for r in conn.execute(_Explain(stmt)))
+
+
+def check_indexes() -> list[tuple[str, str, bool, str]]:
+    """[(label, index, ok, plan)]: ok when the plan uses the index and sorts nothing itself.
+
+    Queries that must seek also fail on a full pass over the index (SQLite's
+    "SCAN ... USING INDEX", a Postgres index scan without an Index Cond).
+    """
+    out = []
+    for label, stmt, index, seek in _hot_queries():
+        plan = explain(stmt)
+        sorts = "TEMP B-TREE" in plan or "Sort" in plan
+        seeks = "SEARCH" in plan or "Index Cond" in plan
+        out.append((label, index, index in plan and not sorts and (seeks or not seek), plan))
+    return out
+
+
+# --- CLI ---
+@click.command("db-upgrade")
+@click.option("--to", "target", type=int, default=None, help="Stop at this version (default: latest).")
+@click.option("--dedupe", is_flag=True,
+              help="Delete duplicate imported rows (keeps the oldest) when adopting an old database.")
+@click.option("--sql", is_flag=True, help="Print the SQL instead of running it.")
+@click.option("--from", "start", type=int, default=0, show_default=True,
+              help="With --sql: the version the target database is at.")
+@click.option("--dialect", type=click.Choice(sorted(_DIALECTS)), default=None,
+              help="With --sql: render for this database (default: DATABASE_URL's).")
+@with_appcontext
+def db_upgrade_cmd(target, dedupe, sql, start, dialect):
+    """Bring the database schema up to date."""
+    if sql:
+        print(upgrade_sql(start, target, dialect or db.engine.dialect.name))
+        return
+    done = upgrade(target, dedupe)
+    for v, description in done:
+        print(f"Applied {v}: {description}")
+    with db.engine.connect() as conn:
+        print(f"Database at version {current_version(conn)} (latest {head()}).")
+
+
+@click.command("db-current")
+@with_appcontext
+def db_current_cmd():
+    """Print the schema version of the database."""
+    with db.engine.connect() as conn:
+        v = current_version(conn)
+    if v is None:
+        print(f"Not versioned; run db-upgrade (latest is {head()}).")
+    else:
+        print(f"{v}{' (latest)' if v == head() else f', {head() - v} pending'}")
+
+
+@click.command("db-history")
+@with_appcontext
+def db_history_cmd():
+    """List the migrations, marking the ones already applied."""
+    with db.engine.connect() as conn:
+        v = current_version(conn) or 0
+    for version, description, _ in MIGRATIONS:
+        print(f"{'*' if version <= v else ' '} {version:3}  {description}")
+
+
+@click.command("db-stamp")
+@click.argument("version", type=int)
+@with_appcontext
+def db_stamp_cmd(version):
+    """Record VERSION as applied without running anything (e.g. after --sql by hand)."""
+    if not 0 <= version <= head():
+        raise click.BadParameter(f"must be between 0 and {head()}", param_hint="VERSION")
+    with db.engine.begin() as conn:
+        _stamp(conn, version)
+    print(f"Stamped version {version}.")
+
+
+@click.command("db-check")
+@click.option("--verbose", "-v", is_flag=True, help="Print every plan, not just failing ones.")
+@with_appcontext
+def db_check_cmd(verbose):
+    """EXPLAIN the hot diary queries and fail unless each one uses its index."""
+    results = check_indexes()
+    for label, index, ok, plan in results:
+        print(f"{'ok  ' if ok else 'FAIL'}  {label:<26} {index}")
+        if verbose or not ok:
+            for line in plan.splitlines():
+                print(f"        {line}")
+    failed = [label for label, _, ok, _ in results if not ok]
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(results)} queries don't use their index; "
+                                   "is the database on the latest version (db-current)?")
+
+
+COMMANDS = (db_upgrade_cmd, db_current_cmd, db_history_cmd, db_stamp_cmd, db_check_cmd)
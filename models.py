@@ -0,0 +1,401 @@
+import re
+from datetime import datetime
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import and_, or_, event, inspect, text, DDL
+from sqlalchemy.orm import Session
+
+from extensions import db
+
+
+# --- Models ---
+# Partial index predicates. Queries meant to use those indexes filter on the
+# same SQL text, since a generic (cached) Postgres plan can't match a bound ''.
+IMPORTED_SQL = "external_id LIKE 'letterboxd:%'"
+MISSING_POSTER_SQL = "(poster_url IS NULL OR poster_url = '')"
+
+
+class DiaryEntry(db.Model):
+    __tablename__ = "diary_entries"
+    id = db.Column(db.Integer, primary_key=True)
+    external_id = db.Column(db.String(128), nullable=False)  # TMDb/TVDB/Letterboxd id/url
+    kind = db.Column(db.String(16), nullable=False)         # 'movie' or 'series'
+    title = db.Column(db.String(256), nullable=False)
+    poster_url = db.Column(db.String(512), nullable=True)
+    date_watched = db.Column(db.Date, nullable=True)
+    rating = db.Column(db.Integer, nullable=True)           # 1..10 (or None)
+    review = db.Column(db.Text, nullable=True)
+    release_year = db.Column(db.Integer)  # <-- add this
+    tmdb_id = db.Column(db.Integer, index=True)            # links to titles (kind, tmdb_id)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # any change to the row (ETags of /api/diary/<id>); Core updates get it too
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    meta = db.relationship(
+        "Title", viewonly=True, uselist=False,
+        primaryjoin="and_(foreign(DiaryEntry.tmdb_id) == Title.tmdb_id, DiaryEntry.kind == Title.kind)")
+
+    # The schema itself comes from migrations.py; keep these in step with it.
+    __table_args__ = (
+        # matches the diary ordering used by keyset pagination; Postgres gets
+        # its own descending version below (migration 2)
+        db.Index("ix_diary_order", "date_watched", "created_at", "id").ddl_if(
+            callable_=lambda *a, dialect, **kw: dialect.name != "postgresql"),
+        # latest entries on the home page
+        db.Index("ix_diary_created", "created_at"),
+        # re-importing the same Letterboxd diary row must not duplicate it;
+        # manual adds (TMDb ids) may legitimately repeat, so only imports are unique
+        db.Index("uq_diary_import_key", "external_id", "date_watched", unique=True,
+                 sqlite_where=db.text(IMPORTED_SQL), postgresql_where=db.text(IMPORTED_SQL)),
+        # backfill-posters
+        db.Index("ix_diary_missing_poster", "id",
+                 sqlite_where=db.text(MISSING_POSTER_SQL), postgresql_where=db.text(MISSING_POSTER_SQL)),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "external_id": self.external_id,
+            "kind": self.kind,
+            "title": self.title,
+            "poster_url": self.poster_url,
+            "date_watched": self.date_watched.isoformat() if self.date_watched else None,
+            "rating": self.rating,
+            "review": self.review,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+# NULLS LAST so undated entries sort after dated ones, as the pages do
+db.Index("ix_diary_order", DiaryEntry.date_watched.desc().nullslast(),
+         DiaryEntry.created_at.desc(), DiaryEntry.id.desc()).ddl_if(dialect="postgresql")
+
+# --- Local title metadata ---
+# TMDb details are persisted here the first time a title is viewed, so item pages
+# are a local lookup afterwards and keep working when TMDb is slow or down.
+class Title(db.Model):
+    __tablename__ = "titles"
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)         # 'movie' or 'series'
+    tmdb_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(256), nullable=False)
+    poster_url = db.Column(db.String(512))
+    overview = db.Column(db.Text)
+    year = db.Column(db.String(4))
+    status = db.Column(db.String(64))
+    runtime = db.Column(db.Integer)
+    vote_average = db.Column(db.Float)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    genres = db.relationship("TitleGenre", order_by="TitleGenre.position",
+                             cascade="all, delete-orphan", lazy="selectin")
+    studios = db.relationship("TitleStudio", order_by="TitleStudio.position",
+                              cascade="all, delete-orphan", lazy="selectin")
+    credits = db.relationship("TitleCredit", order_by="TitleCredit.position",
+                              cascade="all, delete-orphan", lazy="selectin")
+
+    __table_args__ = (db.UniqueConstraint("kind", "tmdb_id", name="uq_titles_kind_tmdb"),)
+
+    def to_item(self):
+        """Same shape as TMDBClient.get_movie/get_series, for item.html."""
+        return {
+            "id": self.tmdb_id,
+            "kind": self.kind,
+            "title": self.title,
+            "poster": self.poster_url,
+            "overview": self.overview,
+            "year": self.year,
+            "status": self.status,
+            "genres": [g.name for g in self.genres],
+            "studios": [s.name for s in self.studios],
+            "runtime": self.runtime,
+            "rating": self.vote_average,
+            "cast": [{"id": c.person_id, "name": c.name, "character": c.character, "photo": c.photo_url}
+                     for c in self.credits],
+        }
+
+
+class TitleGenre(db.Model):
+    __tablename__ = "title_genres"
+    title_id = db.Column(db.Integer, db.ForeignKey("titles.id", ondelete="CASCADE"), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, index=True)
+
+
+class TitleStudio(db.Model):
+    __tablename__ = "title_studios"
+    title_id = db.Column(db.Integer, db.ForeignKey("titles.id", ondelete="CASCADE"), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128), nullable=False)
+
+
+class TitleCredit(db.Model):
+    __tablename__ = "title_credits"
+    title_id = db.Column(db.Integer, db.ForeignKey("titles.id", ondelete="CASCADE"), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)    # billing order
+    person_id = db.Column(db.Integer, index=True)
+    name = db.Column(db.String(256))
+    character = db.Column(db.String(256))
+    photo_url = db.Column(db.String(512))
+
+
+class DiaryState(db.Model):
+    """Single row whose version goes up on every diary write (ETags, cache keys)."""
+    __tablename__ = "diary_state"
+    id = db.Column(db.Integer, primary_key=True)  # always 1
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+def bump_diary_version(conn=None):
+    """+1 the diary version inside the current transaction."""
+    conn = conn or db.session
+    t = DiaryState.__table__
+    res = conn.execute(t.update().where(t.c.id == 1).values(
+        version=t.c.version + 1, changed_at=datetime.utcnow()))
+    if res.rowcount == 0:
+        conn.execute(t.insert().values(id=1, version=1, changed_at=datetime.utcnow()))
+
+
+def diary_version() -> int:
+    return db.session.scalar(db.select(DiaryState.version).where(DiaryState.id == 1)) or 0
+
+
+def diary_state() -> tuple[int, datetime | None]:
+    """(version, changed_at) of the diary; (0, None) before the first write."""
+    row = db.session.execute(
+        db.select(DiaryState.version, DiaryState.changed_at).where(DiaryState.id == 1)).first()
+    return (row.version, row.changed_at) if row else (0, None)
+
+
+# --- Diary statistics ---
+# Aggregates are kept per period ("2024-03", "2024", "undated") and maintained
+# incrementally on every write, so /api/stats reads O(periods) rows instead of
+# scanning diary_entries. Metrics:
+#   watched     films watched in the period (bucket 0)
+#   rating      rating histogram, bucket = rating 1..10
+#   rating_sum  n = rated films, total = sum of ratings (-> average)
+#   decade      films by release decade, bucket = 1990, 2000, ...
+class DiaryStat(db.Model):
+    __tablename__ = "diary_stats"
+    period = db.Column(db.String(16), primary_key=True)
+    metric = db.Column(db.String(16), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True, default=0)
+    n = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+STAT_FIELDS = ("date_watched", "rating", "release_year")
+
+
+def _stat_keys(date_watched, rating, release_year):
+    """[(period, metric, bucket, total)] one entry contributes (n=1 each)."""
+    year = str(date_watched.year) if date_watched else "undated"
+    out = [(year, "watched", 0, 0)]
+    if date_watched:
+        out.append((f"{date_watched.year:04d}-{date_watched.month:02d}", "watched", 0, 0))
+    if rating:
+        out.append((year, "rating", rating, 0))
+        out.append((year, "rating_sum", 0, rating))
+    if release_year:
+        out.append((year, "decade", release_year // 10 * 10, 0))
+    return out
+
+
+def stats_delta(old: dict | None, new: dict | None, into: dict | None = None) -> dict:
+    """Accumulate {(period, metric, bucket): [dn, dtotal]} for an entry going old -> new."""
+    into = {} if into is None else into
+    for vals, sign in ((old, -1), (new, 1)):
+        if vals is None:
+            continue
+        for period, metric, bucket, total in _stat_keys(*(vals.get(f) for f in STAT_FIELDS)):
+            d = into.setdefault((period, metric, bucket), [0, 0])
+            d[0] += sign
+            d[1] += sign * total
+    return into
+
+
+def apply_stats_delta(delta: dict, conn=None):
+    """Add a stats_delta() result to diary_stats inside the current transaction."""
+    conn = conn or db.session
+    t = DiaryStat.__table__
+    for (period, metric, bucket), (dn, dtotal) in delta.items():
+        if not dn and not dtotal:
+            continue
+        where = and_(t.c.period == period, t.c.metric == metric, t.c.bucket == bucket)
+        res = conn.execute(t.update().where(where).values(n=t.c.n + dn, total=t.c.total + dtotal))
+        if res.rowcount == 0:
+            conn.execute(t.insert().values(period=period, metric=metric, bucket=bucket, n=dn, total=dtotal))
+
+
+def rebuild_stats(conn=None) -> int:
+    """Recompute diary_stats from diary_entries inside the current transaction; returns rows written."""
+    conn = conn or db.session
+    delta = {}
+    q = db.select(*(getattr(DiaryEntry, f) for f in STAT_FIELDS)).execution_options(yield_per=1000)
+    for row in conn.execute(q):
+        stats_delta(None, row._mapping, delta)
+    t = DiaryStat.__table__
+    conn.execute(t.delete())
+    rows = [{"period": p, "metric": m, "bucket": b, "n": n, "total": total}
+            for (p, m, b), (n, total) in delta.items() if n]
+    if rows:
+        conn.execute(t.insert(), rows)
+    return len(rows)
+
+
+def _old_stat_values(session, obj) -> dict:
+    """Pre-flush values of STAT_FIELDS for a dirty or deleted entry (DB read if they weren't loaded)."""
+    vals, unknown = {}, False
+    insp = inspect(obj)
+    for f in STAT_FIELDS:
+        hist = insp.attrs[f].history
+        if hist.deleted:
+            vals[f] = hist.deleted[0]
+        elif hist.added:
+            unknown = True  # set without ever being loaded
+        else:
+            vals[f] = getattr(obj, f)
+    if unknown:
+        with session.no_autoflush:
+            row = session.execute(db.select(*(getattr(DiaryEntry, f) for f in STAT_FIELDS))
+                                  .where(DiaryEntry.id == obj.id)).one()
+        vals = dict(row._mapping)
+    return vals
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_stats_delta(session, flush_context, instances):
+    delta = session.info.setdefault("stats_delta", {})
+    for obj in session.new:
+        if isinstance(obj, DiaryEntry):
+            stats_delta(None, {f: getattr(obj, f) for f in STAT_FIELDS}, delta)
+    for obj in session.deleted:
+        if isinstance(obj, DiaryEntry):
+            # stored values: the same flush may also carry an update to this row
+            stats_delta(_old_stat_values(session, obj), None, delta)
+    for obj in session.dirty:
+        if isinstance(obj, DiaryEntry) and session.is_modified(obj):
+            stats_delta(_old_stat_values(session, obj), {f: getattr(obj, f) for f in STAT_FIELDS}, delta)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_diary_writes(session, flush_context):
+    # ORM writes bump the version and stats automatically; Core bulk writes call
+    # bump_diary_version() / apply_stats_delta() themselves
+    if any(isinstance(o, DiaryEntry) for o in chain(session.new, session.dirty, session.deleted)):
+        bump_diary_version(session.connection())
+    delta = session.info.pop("stats_delta", None)
+    if delta:
+        apply_stats_delta(delta, session.connection())
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_stats_delta(session):
+    session.info.pop("stats_delta", None)
+
+
+# --- Diary full-text search ---
+# SQLite: an external-content FTS5 table over title + review kept in sync by
+# triggers. Postgres: an expression GIN index on a tsvector of the same text.
+# `flask setup-search` adds either to an existing database.
+_FTS_SQLITE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS diary_fts USING fts5(
+           title, review, content='diary_entries', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS diary_fts_ai AFTER INSERT ON diary_entries BEGIN
+           INSERT INTO diary_fts(rowid, title, review) VALUES (new.id, new.title, new.review);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS diary_fts_ad AFTER DELETE ON diary_entries BEGIN
+           INSERT INTO diary_fts(diary_fts, rowid, title, review) VALUES ('delete', old.id, old.title, old.review);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS diary_fts_au AFTER UPDATE OF title, review ON diary_entries BEGIN
+           INSERT INTO diary_fts(diary_fts, rowid, title, review) VALUES ('delete', old.id, old.title, old.review);
+           INSERT INTO diary_fts(rowid, title, review) VALUES (new.id, new.title, new.review);
+       END""",
+]
+_FTS_PG_DOC = "(setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', coalesce(review, '')), 'B'))"
+_FTS_PG = [f"CREATE INDEX IF NOT EXISTS ix_diary_fts ON diary_entries USING gin ({_FTS_PG_DOC})"]
+
+for _ddl in _FTS_SQLITE:
+    event.listen(DiaryEntry.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+for _ddl in _FTS_PG:
+    event.listen(DiaryEntry.__table__, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+event.listen(DiaryEntry.__table__, "before_drop",
+             DDL("DROP TABLE IF EXISTS diary_fts").execute_if(dialect="sqlite"))
+
+_SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def search_diary(q: str, limit: int = 20) -> list:
+    """Diary entries matching every word of `q` (prefix match), best first."""
+    tokens = _SEARCH_TOKEN.findall(q or "")[:8]
+    if not tokens:
+        return []
+    dialect = db.engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            match = " ".join('"' + t.replace('"', '""') + '"*' for t in tokens)
+            ids = db.session.execute(text(
+                "SELECT rowid FROM diary_fts WHERE diary_fts MATCH :m "
+                "ORDER BY bm25(diary_fts, 10.0, 1.0) LIMIT :n"), {"m": match, "n": limit}).scalars().all()
+        elif dialect == "postgresql":
+            tsq = " & ".join(f"{t}:*" for t in tokens)
+            ids = db.session.execute(text(
+                f"SELECT id FROM diary_entries WHERE {_FTS_PG_DOC} @@ to_tsquery('simple', :q) "
+                f"ORDER BY ts_rank({_FTS_PG_DOC}, to_tsquery('simple', :q)) DESC LIMIT :n"),
+                {"q": tsq, "n": limit}).scalars().all()
+        else:
+            ids = None
+    except Exception:
+        # e.g. an older database without diary_fts yet; see `flask setup-search`
+        db.session.rollback()
+        current_app.logger.warning("Full-text diary search unavailable, falling back to LIKE", exc_info=True)
+        ids = None
+
+    if ids is None:
+        conds = [or_(DiaryEntry.title.ilike(f"%{t}%"), DiaryEntry.review.ilike(f"%{t}%")) for t in tokens]
+        return (DiaryEntry.query.filter(and_(*conds))
+                .order_by(DiaryEntry.date_watched.desc().nullslast()).limit(limit).all())
+    if not ids:
+        return []
+    by_id = {e.id: e for e in DiaryEntry.query.filter(DiaryEntry.id.in_(ids))}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+# --- Letterboxd imports ---
+class ImportJob(db.Model):
+    """A Letterboxd CSV import running in the background (one row per upload)."""
+    __tablename__ = "import_jobs"
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(256))
+    status = db.Column(db.String(16), nullable=False, default="queued")  # queued/running/done/failed
+    mode = db.Column(db.String(16), nullable=False, default="skip")      # see views.imports.IMPORT_MODES
+    rows_parsed = db.Column(db.Integer, nullable=False, default=0)
+    rows_resolved = db.Column(db.Integer, nullable=False, default=0)
+    rows_inserted = db.Column(db.Integer, nullable=False, default=0)
+    rows_updated = db.Column(db.Integer, nullable=False, default=0)
+    rows_skipped = db.Column(db.Integer, nullable=False, default=0)
+    rows_failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "mode": self.mode,
+            "filename": self.filename,
+            "parsed": self.rows_parsed,
+            "resolved": self.rows_resolved,
+            "inserted": self.rows_inserted,
+            "updated": self.rows_updated,
+            "skipped": self.rows_skipped,
+            "failed": self.rows_failed,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,148 @@
+import hashlib, io, os, re, threading
+
+IMG_BASE = "https://image.tmdb.org/t/p"
+
+# our size names -> TMDb's pre-rendered widths (TMDb does the resizing)
+POSTER_SIZES = {
+    "thumb": "w154",   # diary rows, 56px wide at 2x
+    "card": "w342",    # home / search cards
+    "full": "w500",
+}
+_POSTER_PATH = re.compile(r"^/?[A-Za-z0-9_-]+\.(jpg|jpeg|png|webp)$")
+
+
+class PosterCache:
+    """Disk cache for TMDb poster images with a total-size bound.
+
+    Blobs are content-addressed (blobs/ab/<sha256>) and a small key file maps
+    (size, poster_path) to the blob hash, so the hash doubles as a strong ETag.
+    When the blobs exceed `max_bytes` the least recently served ones (by mtime,
+    touched on every hit) are deleted, along with the keys pointing at them.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 200 * 1024 * 1024, timeout=(3.05, 10)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk, computed on first write
+        # imported here: the template filter only needs poster_proxy_path()
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+    @staticmethod
+    def valid_path(poster_path: str) -> bool:
+        return bool(_POSTER_PATH.match(poster_path or ""))
+
+    def _key_file(self, size, poster_path):
+        k = hashlib.sha256(f"{size}:{poster_path}".encode()).hexdigest()
+        return os.path.join(self.root, "keys", k[:2], k)
+
+    def _blob_file(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    @staticmethod
+    def _write_atomic(path, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def get(self, size: str, poster_path: str) -> tuple[str | io.BytesIO, str]:
+        """(blob file path, sha256 etag); fetches from TMDb on a miss.
+
+        When the blob can't be written (disk full, read-only) the image comes
+        back uncached as a BytesIO instead of a path. Raises requests.HTTPError
+        / RequestException when upstream fails.
+        """
+        poster_path = "/" + poster_path.lstrip("/")
+        key_file = self._key_file(size, poster_path)
+        try:
+            with open(key_file) as fh:
+                digest = fh.read().strip()
+            blob = self._blob_file(digest)
+            os.utime(blob)  # LRU: a hit counts as recent use
+            return blob, digest
+        except OSError:
+            pass
+
+        r = self.session.get(f"{IMG_BASE}/{POSTER_SIZES[size]}{poster_path}", timeout=self.timeout)
+        r.raise_for_status()
+        data = r.content
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self._blob_file(digest)
+        try:
+            if not os.path.exists(blob):
+                self._write_atomic(blob, data)
+                self._account(len(data))
+            self._write_atomic(key_file, digest.encode())
+        except OSError:
+            if not os.path.exists(blob):
+                return io.BytesIO(data), digest
+        return blob, digest
+
+    def _scan(self, sub="blobs"):
+        files = []
+        for dirpath, _, names in os.walk(os.path.join(self.root, sub)):
+            for n in names:
+                p = os.path.join(dirpath, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+        return files
+
+    def _account(self, added: int):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(f[1] for f in self._scan())
+            else:
+                self._size += added
+            if self._size <= self.max_bytes:
+                return
+            # evict down to 90% so we don't rescan on every write near the limit
+            files = sorted(self._scan())
+            self._size = sum(f[1] for f in files)
+            target = int(self.max_bytes * 0.9)
+            for _, nbytes, path in files:
+                if self._size <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self._size -= nbytes
+                except OSError:
+                    pass
+            self._sweep_keys()
+
+    def _sweep_keys(self):
+        # keys of evicted blobs would otherwise pile up (a hit on one is just a miss)
+        for _, _, path in self._scan("keys"):
+            try:
+                with open(path) as fh:
+                    digest = fh.read().strip()
+                if not os.path.exists(self._blob_file(digest)):
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        files = self._scan()
+        return {"files": len(files), "bytes": sum(f[1] for f in files), "max_bytes": self.max_bytes}
+
+
+def poster_proxy_path(url: str | None, size: str = "thumb") -> str | None:
+    """TMDb poster URL -> '<size>/<file>' for the proxy route, None if not a TMDb URL."""
+    if not url or not url.startswith(IMG_BASE + "/"):
+        return None
+    tail = url[len(IMG_BASE) + 1:]          # e.g. "w500/abc.jpg"
+    _, _, filename = tail.partition("/")
+    return f"{size}/{filename}" if _POSTER_PATH.match(filename) else None
@@ -6,7 +6,13 @@ document.addEventListener("click", (e) => {
     if(confirm("Remove this diary entry?")){
       fetch(`/api/diary/${id}`, {method: "DELETE"})
         .then(r => r.json())
-        .then(ok => { if(ok.ok){ location.reload(); } });
+        .then(ok => {
+          if(!ok.ok) return;
+          // drop the row (and its day if that was the last one) instead of reloading
+          const group = btn.closest(".date-group");
+          btn.closest("li").remove();
+          if(group && !group.querySelector(".list > li")) group.remove();
+        });
     }
   }
 });
@@ -24,7 +30,10 @@ if(addForm){
     })
     .then(r => r.json())
     .then(res => {
-      if(res.ok){
+      if(res.ok && res.queued){
+        // offline: the service worker keeps it and replays when we're back
+        document.getElementById("add-result").textContent = "Saved offline — will sync when you're back online";
+      }else if(res.ok){
         document.getElementById("add-result").textContent = "Added ✓";
         setTimeout(() => window.location.href = "/diary", 400);
       }else{
@@ -146,3 +155,164 @@ const bottomSearch = document.querySelector(".bottom-search input");
     ro.observe(poster);
   }
 })();
+
+// Letterboxd import: poll the background job until it finishes
+(function pollImport(){
+  const box = document.getElementById("import-progress");
+  if (!box) return;
+  const set = (name, val) => {
+    const el = box.querySelector(`[data-field="${name}"]`);
+    if (el) el.textContent = val;
+  };
+  function tick(){
+    fetch(`/api/import/${box.dataset.job}`)
+      .then(r => r.json())
+      .then(job => {
+        set("status", job.status.charAt(0).toUpperCase() + job.status.slice(1));
+        ["parsed", "resolved", "inserted", "updated", "skipped", "failed"].forEach(k => set(k, job[k]));
+        if (job.error) {
+          set("error", job.error);
+          box.querySelector('[data-field="error"]').hidden = false;
+        }
+        if (job.status === "queued" || job.status === "running") setTimeout(tick, 1000);
+      })
+      .catch(() => setTimeout(tick, 3000));
+  }
+  if (box.dataset.status === "queued" || box.dataset.status === "running") tick();
+})();
+
+// Diary: infinite scroll over keyset-paginated pages
+(function diaryInfiniteScroll(){
+  const wrap = document.getElementById("diary-groups");
+  if (!wrap) return;
+  let loading = false;
+
+  function watch(){
+    const more = wrap.querySelector(".diary-more[data-next]");
+    if (!more) return;
+    if (!("IntersectionObserver" in window)) {
+      more.innerHTML = '<button type="button">Load more</button>';
+      more.querySelector("button").addEventListener("click", () => load(more));
+      return;
+    }
+    const io = new IntersectionObserver((hits) => {
+      if (hits.some(h => h.isIntersecting)) { io.disconnect(); load(more); }
+    }, {rootMargin: "600px"});
+    io.observe(more);
+  }
+
+  function load(more){
+    if (loading) return;
+    loading = true;
+    fetch(more.dataset.next, {headers: {"Accept": "text/html"}})
+      .then(r => r.text())
+      .then(html => {
+        const tpl = document.createElement("template");
+        tpl.innerHTML = html;
+        more.remove();
+        // a day can straddle two pages: fold its rows into the group already shown
+        const first = tpl.content.querySelector(".date-group");
+        const groups = wrap.querySelectorAll(".date-group");
+        const last = groups[groups.length - 1];
+        if (first && last && first.dataset.date === last.dataset.date) {
+          last.querySelector(".list").append(...first.querySelectorAll(".list > li"));
+          first.remove();
+        }
+        wrap.append(tpl.content);
+        loading = false;
+        watch();
+      })
+      .catch(() => { loading = false; });
+  }
+
+  watch();
+})();
+
+// replay diary writes queued by the service worker while offline
+window.addEventListener("online", () => {
+  if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+    navigator.serviceWorker.controller.postMessage("replay-outbox");
+  }
+});
+
+// search-as-you-type: debounced /api/suggest, stale requests aborted
+(function searchSuggest(){
+  const DEBOUNCE_MS = 150;
+  const cache = new Map();  // q -> results, for backspacing over what we've seen
+
+  document.querySelectorAll(".nav-search, .bottom-search").forEach((form) => {
+    const input = form.querySelector("input[name=q]");
+    if (!input) return;
+    const list = document.createElement("ul");
+    list.className = "suggest";
+    list.hidden = true;
+    form.appendChild(list);
+    let timer = null, ctrl = null, active = -1;
+
+    function hide(){ list.hidden = true; active = -1; }
+
+    function render(results){
+      list.innerHTML = "";
+      active = -1;
+      results.forEach((r) => {
+        const li = document.createElement("li");
+        const a = document.createElement("a");
+        a.href = r.id ? `/item/${r.kind}/${r.id}` : `/search?q=${encodeURIComponent(r.title)}`;
+        if (r.poster) {
+          const img = document.createElement("img");
+          img.src = r.poster; img.alt = ""; img.loading = "lazy";
+          a.appendChild(img);
+        }
+        const label = document.createElement("span");
+        label.textContent = r.year ? `${r.title} (${r.year})` : r.title;
+        a.appendChild(label);
+        if (r.source === "diary") {
+          const tag = document.createElement("small");
+          tag.textContent = "in diary";
+          a.appendChild(tag);
+        }
+        li.appendChild(a);
+        list.appendChild(li);
+      });
+      list.hidden = results.length === 0;
+    }
+
+    function fetchSuggest(q){
+      if (cache.has(q)) { render(cache.get(q)); return; }
+      if (ctrl) ctrl.abort();
+      ctrl = new AbortController();
+      fetch(`/api/suggest?q=${encodeURIComponent(q)}`, {signal: ctrl.signal})
+        .then((r) => r.json())
+        .then((res) => {
+          cache.set(q, res.results);
+          if (input.value.trim() === q) render(res.results);
+        })
+        .catch(() => {});  // aborted or offline: keep whatever is shown
+    }
+
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      const q = input.value.trim();
+      if (q.length < 2) { if (ctrl) ctrl.abort(); hide(); return; }
+      timer = setTimeout(() => fetchSuggest(q), DEBOUNCE_MS);
+    });
+
+    input.addEventListener("keydown", (e) => {
+      const items = list.querySelectorAll("a");
+      if (list.hidden || !items.length) return;
+      if (e.key === "ArrowDown" || e.key === "ArrowUp") {
+        e.preventDefault();
+        active = (active + (e.key === "ArrowDown" ? 1 : items.length - 1)) % items.length;
+        items.forEach((a, i) => a.classList.toggle("active", i === active));
+      } else if (e.key === "Enter" && active >= 0) {
+        e.preventDefault();
+        window.location.href = items[active].href;
+      } else if (e.key === "Escape") {
+        hide();
+      }
+    });
+
+    input.addEventListener("blur", () => setTimeout(hide, 150));  // let clicks land first
+    input.addEventListener("focus", () => { if (list.children.length) list.hidden = false; });
+  });
+})();
@@ -1 +1,204 @@
-const CACHE="maxi-v1";const ASSETS=["/","/static/css/styles.css","/static/js/app.js","/manifest.json"];self.addEventListener("install",e=>{e.waitUntil(caches.open(CACHE).then(c=>c.addAll(ASSETS)));self.skipWaiting()});self.addEventListener("activate",e=>{e.waitUntil(caches.keys().then(keys=>Promise.all(keys.filter(k=>k!==CACHE).map(k=>caches.delete(k)))));self.clients.claim()});self.addEventListener("fetch",e=>{const u=new URL(e.request.url);if(u.origin===location.origin){e.respondWith(caches.match(e.request).then(m=>m||fetch(e.request)))}})
\ No newline at end of file
+// Maximilian service worker.
+// __ASSET_VERSION__ is replaced by the /sw.js route with a hash of the static
+// assets, so any CSS/JS change installs a new worker and drops old caches.
+const VERSION = "__ASSET_VERSION__";
+const STATIC_CACHE = `maxi-static-${VERSION}`;
+const PAGE_CACHE = `maxi-pages-${VERSION}`;
+const API_CACHE = `maxi-api-${VERSION}`;
+const POSTER_CACHE = "maxi-posters";   // content never changes, survives upgrades
+const POSTER_MAX_ENTRIES = 400;
+const PRECACHE = ["/", "/static/css/styles.css", "/static/js/app.js", "/manifest.json",
+                  "/static/icons/placeholder.png"];
+const QUEUE_DB = "maxi-outbox";
+
+self.addEventListener("install", (e) => {
+  e.waitUntil(caches.open(STATIC_CACHE).then((c) => c.addAll(PRECACHE)));
+  self.skipWaiting();
+});
+
+self.addEventListener("activate", (e) => {
+  const keep = [STATIC_CACHE, PAGE_CACHE, API_CACHE, POSTER_CACHE];
+  e.waitUntil(
+    caches.keys()
+      .then((keys) => Promise.all(keys.filter((k) => !keep.includes(k)).map((k) => caches.delete(k))))
+      .then(() => self.clients.claim())
+      .then(replayQueue)
+  );
+});
+
+// --- strategies ---
+function staleWhileRevalidate(event, cacheName) {
+  return caches.open(cacheName).then((cache) =>
+    cache.match(event.request).then((cached) => {
+      const network = fetch(event.request).then((resp) => {
+        if (resp.ok) cache.put(event.request, resp.clone());
+        return resp;
+      });
+      if (cached) {
+        event.waitUntil(network.catch(() => {}));
+        return cached;
+      }
+      return network;
+    })
+  );
+}
+
+function cacheFirst(request, cacheName) {
+  // static URLs carry ?v=<hash>; the cache itself is already per-version
+  return caches.open(cacheName).then((cache) =>
+    cache.match(request, {ignoreSearch: true}).then((cached) => cached || fetch(request).then((resp) => {
+      if (resp.ok) cache.put(request, resp.clone());
+      return resp;
+    }))
+  );
+}
+
+function posterCacheFirst(event) {
+  return caches.open(POSTER_CACHE).then((cache) =>
+    cache.match(event.request).then((cached) => {
+      if (cached) return cached;
+      return fetch(event.request).then((resp) => {
+        if (resp.ok) {
+          event.waitUntil(cache.put(event.request, resp.clone()).then(() => trimCache(cache, POSTER_MAX_ENTRIES)));
+        }
+        return resp;
+      });
+    })
+  );
+}
+
+function trimCache(cache, max) {
+  // keys() comes back in insertion order: drop the oldest first
+  return cache.keys().then((keys) =>
+    Promise.all(keys.slice(0, Math.max(0, keys.length - max)).map((k) => cache.delete(k))));
+}
+
+function clearDynamicCaches() {
+  return Promise.all([caches.delete(PAGE_CACHE), caches.delete(API_CACHE)]);
+}
+
+// --- offline write queue (IndexedDB) ---
+function openQueue() {
+  return new Promise((resolve, reject) => {
+    const req = indexedDB.open(QUEUE_DB, 1);
+    req.onupgradeneeded = () => req.result.createObjectStore("requests", {keyPath: "id", autoIncrement: true});
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+  });
+}
+
+function queueTx(mode, fn) {
+  return openQueue().then((db) => new Promise((resolve, reject) => {
+    const tx = db.transaction("requests", mode);
+    const out = fn(tx.objectStore("requests"));
+    tx.oncomplete = () => resolve(out && out.result);
+    tx.onerror = () => reject(tx.error);
+  }));
+}
+
+function enqueue(request) {
+  return request.clone().text().then((body) => queueTx("readwrite", (store) => store.add({
+    url: request.url, method: request.method, body,
+    contentType: request.headers.get("Content-Type") || "application/json",
+    queuedAt: Date.now(),
+  })));
+}
+
+function dropQueued(items) {
+  return queueTx("readwrite", (store) => items.forEach((item) => store.delete(item.id)));
+}
+
+function replayOne(item) {
+  return fetch(item.url, {method: item.method, body: item.body, headers: {"Content-Type": item.contentType}})
+    .then((resp) => {
+      // 4xx won't get better by retrying: drop it; 5xx stays queued
+      if (resp.ok || (resp.status >= 400 && resp.status < 500)) return dropQueued([item]);
+    });
+}
+
+// Diary adds made offline go back as one /api/diary/batch request (one
+// transaction); ops the server rejects are dropped and the rest resent.
+function replayAdds(items) {
+  if (!items.length) return Promise.resolve();
+  if (items.length === 1) return replayOne(items[0]);
+  let ops;
+  try {
+    ops = items.map((item) => Object.assign({}, JSON.parse(item.body), {op: "create"}));
+  } catch (err) {
+    return items.reduce((chain, item) => chain.then(() => replayOne(item)), Promise.resolve());
+  }
+  return fetch("/api/diary/batch", {method: "POST", body: JSON.stringify(ops),
+                                    headers: {"Content-Type": "application/json"}})
+    .then((resp) => {
+      if (resp.ok) return dropQueued(items);
+      if (resp.status >= 500) return;  // stays queued
+      return resp.json().then((res) => {
+        const bad = new Set((res.errors || []).map((e) => e[0]));
+        if (!bad.size) {
+          // e.g. a conflict the batch can't pin on one op: fall back to one by one
+          return items.reduce((chain, item) => chain.then(() => replayOne(item)), Promise.resolve());
+        }
+        return dropQueued(items.filter((_, n) => bad.has(n)))
+          .then(() => replayAdds(items.filter((_, n) => !bad.has(n))));
+      });
+    });
+}
+
+let replaying = null;
+function replayQueue() {
+  if (replaying) return replaying;
+  replaying = queueTx("readonly", (store) => store.getAll())
+    .then(replayAdds)  // only POST /api/diary is ever queued (see the fetch handler)
+    .then(clearDynamicCaches)
+    .catch(() => {})  // still offline; try again on the next sync/online
+    .finally(() => { replaying = null; });
+  return replaying;
+}
+
+self.addEventListener("sync", (e) => {
+  if (e.tag === "diary-outbox") e.waitUntil(replayQueue());
+});
+
+self.addEventListener("message", (e) => {
+  if (e.data === "replay-outbox") e.waitUntil(replayQueue());
+});
+
+// --- routing ---
+self.addEventListener("fetch", (e) => {
+  const req = e.request;
+  const u = new URL(req.url);
+  const sameOrigin = u.origin === location.origin;
+
+  if (req.method !== "GET") {
+    if (!sameOrigin) return;
+    if (req.method === "POST" && u.pathname === "/api/diary") {
+      e.respondWith(fetch(req.clone())
+        .then((resp) => { e.waitUntil(clearDynamicCaches()); return resp; })
+        .catch(() => enqueue(req).then(() => {
+          if (self.registration.sync) self.registration.sync.register("diary-outbox").catch(() => {});
+          return new Response(JSON.stringify({ok: true, queued: true}),
+                              {status: 202, headers: {"Content-Type": "application/json"}});
+        })));
+      return;
+    }
+    // any other write invalidates cached pages/API once it succeeds
+    e.respondWith(fetch(req).then((resp) => { e.waitUntil(clearDynamicCaches()); return resp; }));
+    return;
+  }
+
+  if (sameOrigin && u.pathname.startsWith("/img/poster/")) {
+    // only our proxy: image.tmdb.org responses are opaque, so a failure can't be
+    // told apart and each one is charged a padded quota size
+    e.respondWith(posterCacheFirst(e));
+  } else if (!sameOrigin) {
+    return;
+  } else if (u.pathname.startsWith("/static/") || u.pathname === "/manifest.json") {
+    e.respondWith(cacheFirst(req, STATIC_CACHE));
+  } else if (u.pathname === "/api/diary") {
+    e.respondWith(staleWhileRevalidate(e, API_CACHE));
+  } else if (u.pathname.startsWith("/import")) {
+    return;  // upload/progress pages must always be live
+  } else if (req.mode === "navigate" || (req.headers.get("Accept") || "").includes("text/html")) {
+    e.respondWith(staleWhileRevalidate(e, PAGE_CACHE));
+  }
+});
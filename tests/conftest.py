@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# in-process caches only, and no page cache, so every request hits the database
+os.environ.setdefault("CACHE_URL", "")
+os.environ.setdefault("PAGE_CACHE_ITEMS", "0")
+
+
+@pytest.fixture
+def app(tmp_path):
+    import migrations
+    from app import create_app
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}", "TESTING": True})
+    with app.app_context():
+        migrations.upgrade()
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,53 @@
+from extensions import db
+from models import DiaryStat, rebuild_stats
+
+
+def _stats():
+    return sorted((s.period, s.metric, s.bucket, s.n, s.total)
+                  for s in db.session.scalars(db.select(DiaryStat)) if s.n)
+
+
+def _add(client, title, rating):
+    r = client.post("/api/diary/batch", json=[{"op": "create", "kind": "movie", "title": title,
+                                               "date_watched": "2024-05-01", "rating": rating}])
+    assert r.status_code == 200, r.json
+    return r.json["results"][0][1]
+
+
+def test_update_then_delete_keeps_stats(client):
+    _add(client, "The Matrix", 9)
+    alien = _add(client, "Alien", 8)
+
+    r = client.post("/api/diary/batch", json=[{"op": "update", "id": alien, "rating": 10},
+                                              {"op": "delete", "id": alien}])
+    assert r.status_code == 200, r.json
+
+    stats = client.get("/api/stats").json
+    assert stats["rating_histogram"].get("10", 0) == 0
+    assert stats["rating_histogram"].get("8", 0) == 0
+    assert stats["rating_histogram"]["9"] == 1
+    assert stats["years"] == [{"year": "2024", "watched": 1, "avg_rating": 9.0}]
+
+    live = _stats()
+    rebuild_stats()
+    assert live == _stats()
+
+
+def test_bad_field_types_are_rejected(client):
+    entry = _add(client, "Alien", 8)
+    assert client.patch(f"/api/diary/{entry}", json={"title": 5}).status_code == 400
+    assert client.patch(f"/api/diary/{entry}", json=["title"]).status_code == 400
+    r = client.post("/api/diary/batch", json=[{"op": "update", "id": entry, "title": 5}])
+    assert r.status_code == 400 and r.json["errors"][0][:2] == [0, 400]
+    r = client.post("/api/diary/batch", json=[{"op": "create", "kind": "movie", "title": ["x"]}])
+    assert r.status_code == 400
+
+
+def test_external_id_must_be_a_string_or_tmdb_id(client):
+    r = client.post("/api/diary", json={"kind": "movie", "title": "Alien", "external_id": {"a": 1}})
+    assert r.status_code == 400
+    r = client.post("/api/diary/batch", json=[{"op": "create", "kind": "movie", "title": "Alien",
+                                               "external_id": ["348"]}])
+    assert r.status_code == 400 and r.json["errors"][0][:2] == [0, 400]
+    r = client.post("/api/diary", json={"kind": "movie", "title": "Alien", "external_id": 348})
+    assert r.status_code == 201 and r.json["entry"]["external_id"] == "348"
@@ -0,0 +1,34 @@
+import pytest
+
+from extensions import db
+from models import DiaryEntry
+
+
+@pytest.fixture
+def entry(client):
+    r = client.post("/api/diary", json={"kind": "movie", "title": "Alien", "date_watched": "2024-05-01",
+                                        "rating": 8, "review": "Tense."})
+    return r.json["entry"]["id"]
+
+
+def _edit(client, entry, **form):
+    return client.post(f"/entry/{entry}/edit", data={"date_watched": "2024-05-02", "rating": "6",
+                                                     "review": " Still tense. ", **form})
+
+
+def test_edit_form_saves(client, entry):
+    assert _edit(client, entry).status_code == 302
+    e = db.session.get(DiaryEntry, entry)
+    assert (e.title, str(e.date_watched), e.rating, e.review) == ("Alien", "2024-05-02", 6, "Still tense.")
+    assert _edit(client, entry, rating="", review="").status_code == 302
+    db.session.refresh(e)
+    assert (e.rating, e.review) == (None, None)
+
+
+@pytest.mark.parametrize("form", [{"rating": "ten"}, {"rating": "11"}, {"rating": "0"},
+                                  {"date_watched": "yesterday"}])
+def test_edit_form_rejects_bad_values(client, entry, form):
+    r = _edit(client, entry, **form)
+    assert r.status_code == 400 and 'class="error"' in r.get_data(as_text=True)
+    e = db.session.get(DiaryEntry, entry)
+    assert (str(e.date_watched), e.rating) == ("2024-05-01", 8)
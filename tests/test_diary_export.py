@@ -0,0 +1,25 @@
+import gzip
+import json
+
+
+def _export(client, encoding, etag=None):
+    headers = {"Accept-Encoding": encoding, **({"If-None-Match": etag} if etag else {})}
+    # the body streams inside the request context; closing releases it
+    with client.get("/api/diary/export", headers=headers) as r:
+        r.get_data()
+    return r
+
+
+def test_export_etag_depends_on_encoding(client):
+    client.post("/api/diary", json={"kind": "movie", "title": "Alien"})
+    plain, zipped = _export(client, "identity"), _export(client, "gzip")
+    assert json.loads(plain.get_data())["title"] == "Alien"
+    assert json.loads(gzip.decompress(zipped.get_data()))["title"] == "Alien"
+    assert plain.headers["ETag"] != zipped.headers["ETag"]
+    assert plain.headers["Vary"] == zipped.headers["Vary"] == "Accept-Encoding"
+
+    r = _export(client, "gzip", zipped.headers["ETag"])
+    assert r.status_code == 304 and r.headers["Vary"] == "Accept-Encoding"
+    # a cached identity body doesn't validate for a gzip request
+    r = _export(client, "gzip", plain.headers["ETag"])
+    assert r.status_code == 200 and r.headers["Content-Encoding"] == "gzip"
@@ -0,0 +1,77 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import DiaryEntry
+
+ORDER = (DiaryEntry.date_watched.desc().nullslast(), DiaryEntry.created_at.desc(), DiaryEntry.id.desc())
+
+
+@pytest.fixture
+def entries(app):
+    # several per day, shared created_at within a day, and an undated tail
+    base = datetime(2024, 1, 1, 12)
+    rows = []
+    for n in range(40):
+        watched = None if n % 7 == 0 else date(2024, 3, 1) - timedelta(days=n // 3)
+        rows.append({"external_id": str(n), "kind": "movie", "title": f"Film {n}",
+                     "date_watched": watched, "created_at": base + timedelta(hours=n // 2)})
+    db.session.execute(DiaryEntry.__table__.insert(), rows)
+    db.session.commit()
+    return db.session.scalars(db.select(DiaryEntry.id).order_by(*ORDER)).all()
+
+
+def _walk(client, limit, path="/api/diary"):
+    ids, cursor = [], None
+    while True:
+        args = {"limit": limit, "fields": "id,date_watched"}
+        if cursor:
+            args["cursor"] = cursor
+        r = client.get(path, query_string=args)
+        assert r.status_code == 200
+        ids += [e["id"] for e in r.json["entries"]]
+        cursor = r.json["next_cursor"]
+        if not cursor:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 4, 5, 6, 50])
+def test_pages_follow_diary_order_into_the_undated_tail(client, entries, limit):
+    assert _walk(client, limit) == entries
+
+
+def test_undated_entries_come_last(client, entries):
+    r = client.get("/api/diary", query_string={"limit": 100, "fields": "id,date_watched"})
+    dates = [e["date_watched"] for e in r.json["entries"]]
+    assert None in dates and dates.index(None) == len(dates) - dates.count(None)
+
+
+def test_html_pages_use_the_same_cursor(client, entries):
+    r = client.get("/diary", query_string={"limit": 30})
+    assert r.status_code == 200
+    cursor = r.get_data(as_text=True).split("cursor=")[1].split('"')[0].split("&")[0]
+    r = client.get("/api/diary", query_string={"limit": 100, "fields": "id", "cursor": cursor})
+    assert [e["id"] for e in r.json["entries"]] == entries[30:]
+
+
+def test_bad_cursor(client, entries):
+    r = client.get("/api/diary?cursor=garbage")
+    assert r.status_code == 400 and r.is_json and r.json["ok"] is False
+    r = client.get("/diary?cursor=garbage")
+    assert r.status_code == 400 and r.mimetype == "text/html"
+
+
+def test_bad_limit(client, entries):
+    r = client.get("/api/diary?limit=abc")
+    assert r.status_code == 400 and r.is_json and r.json["ok"] is False
+    r = client.get("/diary?limit=abc")
+    assert r.status_code == 400 and r.mimetype == "text/html"
+    assert len(client.get("/api/diary?limit=9999").json["entries"]) == len(entries)
+
+
+def test_fields_projection(client, entries):
+    r = client.get("/api/diary", query_string={"fields": "id,title", "limit": 2})
+    assert [set(e) for e in r.json["entries"]] == [{"id", "title"}] * 2
+    r = client.get("/api/diary", query_string={"fields": "id,password"})
+    assert r.status_code == 400 and "password" in r.json["error"]
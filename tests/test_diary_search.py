@@ -0,0 +1,6 @@
+def test_search_limit(client):
+    for n in range(3):
+        client.post("/api/diary", json={"kind": "movie", "title": f"Alien {n}"})
+    assert len(client.get("/api/diary/search?q=alien&limit=2").json["entries"]) == 2
+    r = client.get("/api/diary/search?q=alien&limit=x")
+    assert r.status_code == 400 and r.is_json and r.json["ok"] is False
@@ -0,0 +1,13 @@
+import os
+
+import extensions
+
+
+def test_tmdb_cache_lives_in_the_instance_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(extensions, "CACHE_URL", "sqlite")
+    monkeypatch.delenv("TMDB_CACHE_PATH", raising=False)
+    monkeypatch.setenv("TMDB_API_KEY", "test")
+    monkeypatch.setattr(app, "instance_path", str(tmp_path / "instance"))
+    client = extensions._make_tmdb(app)
+    assert client.cache.path == os.path.join(app.instance_path, "tmdb_cache.db")
+    assert os.path.isfile(client.cache.path)
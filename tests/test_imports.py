@@ -0,0 +1,68 @@
+import io
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import DiaryEntry
+from views import imports
+
+HEADER = "Date,Name,Year,Letterboxd URI,Rating,Rewatch,Tags,Watched Date\n"
+CSV = HEADER + (
+    "2024-01-02,Alien,1979,https://boxd.it/a,4,,,2024-01-01\n"
+    "2024-01-03,Alien,1979,https://boxd.it/a,5,Yes,,2024-02-01\n"  # same film, another watch
+    "2024-01-04,Heat,1995,https://boxd.it/h,3.5,,,\n"               # undated
+    "2024-01-05,Ran,1985,https://boxd.it/r,4.5,,,2024-03-01\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def no_posters(monkeypatch):
+    monkeypatch.setattr(imports, "tmdb_posters_for_movies", lambda keys: {k: None for k in keys})
+
+
+def _import(app, csv, mode="skip", chunk_size=2):
+    return imports.ingest_letterboxd(io.BytesIO(csv.encode()), chunk_size=chunk_size, mode=mode)
+
+
+def _diary():
+    return sorted(db.session.execute(db.select(DiaryEntry.external_id, DiaryEntry.date_watched,
+                                               DiaryEntry.rating)).all(), key=str)
+
+
+def test_reimport_is_a_no_op(app):
+    first = _import(app, CSV)
+    assert (first["rows_inserted"], first["rows_skipped"]) == (4, 0)
+    before = _diary()
+    again = _import(app, CSV)
+    assert (again["rows_inserted"], again["rows_updated"], again["rows_skipped"]) == (0, 0, 4)
+    assert _diary() == before
+
+
+def test_repeated_rows_in_one_chunk_keep_the_last(app):
+    rows = "".join(f"x,Heat,1995,https://boxd.it/h,{r},,,\n" for r in (3, 3.5, 4))
+    counts = _import(app, HEADER + rows, chunk_size=10)
+    assert (counts["rows_inserted"], counts["rows_skipped"]) == (1, 2)
+    assert [r.rating for r in _diary()] == [8]
+
+
+def test_update_mode_merges_changes(app):
+    _import(app, CSV)
+    changed = CSV.replace("https://boxd.it/r,4.5", "https://boxd.it/r,2")
+    counts = _import(app, changed, mode="update")
+    assert (counts["rows_inserted"], counts["rows_updated"], counts["rows_skipped"]) == (0, 1, 3)
+    assert {r.external_id: r.rating for r in _diary()}["letterboxd:https://boxd.it/r"] == 4
+    skip = _import(app, CSV)
+    assert (skip["rows_updated"], skip["rows_skipped"]) == (0, 4)
+
+
+def test_unique_index_only_covers_imports(app, client):
+    for _ in range(2):  # manual adds of the same TMDb title may repeat
+        assert client.post("/api/diary", json={"kind": "movie", "title": "Alien", "external_id": "348",
+                                                "date_watched": "2024-01-01"}).status_code == 201
+    _import(app, CSV)
+    row = {"external_id": "letterboxd:https://boxd.it/a", "kind": "movie", "title": "Alien",
+           "date_watched": db.func.date("2024-01-01")}
+    with pytest.raises(IntegrityError):
+        db.session.execute(db.insert(DiaryEntry).values(**row))
+    db.session.rollback()
@@ -0,0 +1,59 @@
+import time
+from datetime import datetime
+
+import pytest
+
+import http_cache
+from extensions import db
+from models import Title
+from views import item as item_views
+
+ALIEN = {"id": 348, "kind": "movie", "title": "Alien", "poster": None, "overview": "In space.",
+         "year": "1979", "status": "Released", "genres": ["Horror"], "studios": [], "runtime": 117,
+         "rating": 8.2, "cast": []}
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+    monkeypatch.setattr(item_views, "_fetch_title", lambda kind, tmdb_id: calls.append(tmdb_id) or dict(ALIEN))
+    return calls
+
+
+def _age_title():
+    db.session.execute(db.update(Title).values(fetched_at=datetime(2000, 1, 1)))
+    db.session.commit()
+
+
+def _wait_for_refresh():
+    for _ in range(200):
+        if not item_views._title_refreshing:
+            return
+        time.sleep(0.01)
+
+
+def test_stale_title_refreshes_behind_a_304(client, fetches):
+    client.get("/item/movie/348")
+    _age_title()
+    etag = client.get("/item/movie/348").headers["ETag"]
+    _wait_for_refresh()
+    fetches.clear()
+    _age_title()
+
+    assert client.get("/item/movie/348", headers={"If-None-Match": etag}).status_code == 304
+    _wait_for_refresh()
+    assert fetches == [348]
+
+
+def test_stale_title_refreshes_behind_the_page_cache(app, client, fetches, monkeypatch):
+    monkeypatch.setattr(http_cache, "PAGE_CACHE_ITEMS", 16)
+    client.get("/item/movie/348")
+    _age_title()
+    client.get("/item/movie/348")  # renders and caches the page for the aged row
+    _wait_for_refresh()
+    fetches.clear()
+    _age_title()
+
+    assert client.get("/item/movie/348").status_code == 200
+    _wait_for_refresh()
+    assert fetches == [348]
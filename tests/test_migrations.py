@@ -0,0 +1,123 @@
+import click
+import pytest
+from sqlalchemy import or_
+
+import migrations
+from extensions import db
+from models import DiaryEntry
+
+
+def test_db_check_passes_on_a_fresh_database(app):
+    results = migrations.check_indexes()
+    assert results and all(ok for _, _, ok, _ in results), results
+
+
+def test_db_check_fails_a_keyset_query_that_scans(app, monkeypatch):
+    E = DiaryEntry
+    # the OR with IS NULL can't bound ix_diary_order, so this reads it end to end
+    scan = (db.select(E).where(or_(E.date_watched < db.func.current_date(), E.date_watched.is_(None)))
+            .order_by(E.date_watched.desc(), E.created_at.desc(), E.id.desc()).limit(51))
+    monkeypatch.setattr(migrations, "_hot_queries", lambda: [("scan", scan, "ix_diary_order", True),
+                                                             ("scan, no seek needed", scan, "ix_diary_order", False)])
+    (_, _, must_seek, plan), (_, _, may_scan, _) = migrations.check_indexes()
+    assert "SCAN" in plan and "ix_diary_order" in plan
+    assert not must_seek
+    assert may_scan
+
+
+@pytest.fixture
+def bare_app(tmp_path):
+    """An app whose database hasn't been touched (no upgrade run)."""
+    from app import create_app
+    path = tmp_path / "bare.db"
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "TESTING": True})
+    app.db_path = str(path)
+    with app.app_context():
+        yield app
+
+
+LEGACY = """
+CREATE TABLE diary_entries (id INTEGER NOT NULL PRIMARY KEY, external_id VARCHAR(128) NOT NULL,
+  kind VARCHAR(16) NOT NULL, title VARCHAR(256) NOT NULL, poster_url VARCHAR(512), date_watched DATE,
+  rating INTEGER, review TEXT, created_at DATETIME NOT NULL);
+INSERT INTO diary_entries VALUES (1, '603', 'movie', 'The Matrix', NULL, '2024-01-02', 8, NULL, '2024-01-02 10:00:00');
+INSERT INTO diary_entries VALUES (2, 'letterboxd:a', 'movie', 'Alien', '', '2024-01-03', 7, NULL, '2024-01-03 10:00:00');
+INSERT INTO diary_entries VALUES (3, 'letterboxd:a', 'movie', 'Alien', 'http://p', '2024-01-03', 7, NULL, '2024-01-03 11:00:00');
+"""
+
+
+def _version():
+    with db.engine.connect() as conn:
+        return migrations.current_version(conn)
+
+
+def _indexes():
+    return {i["name"] for i in db.inspect(db.engine).get_indexes("diary_entries")}
+
+
+def test_upgrade_fresh_database(bare_app):
+    assert _version() is None
+    assert [v for v, _ in migrations.upgrade(target=1)] == [1]
+    assert _version() == 1 and "ix_diary_missing_poster" not in _indexes()
+    assert [v for v, _ in migrations.upgrade()] == [2]
+    assert _version() == migrations.head()
+    assert {"ix_diary_order", "ix_diary_created", "ix_diary_missing_poster", "uq_diary_import_key"} <= _indexes()
+    assert "updated_at" in {c["name"] for c in db.inspect(db.engine).get_columns("diary_entries")}
+    assert migrations.upgrade() == []
+
+
+def test_failed_migration_rolls_back(bare_app, monkeypatch):
+    migrations.upgrade()
+    boom = (3, "boom", lambda dialect: ["CREATE INDEX ix_tmp ON diary_entries (title)", "SELECT nope FROM nowhere"])
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*migrations.MIGRATIONS, boom])
+    with pytest.raises(Exception):
+        migrations.upgrade()
+    assert _version() == 2 and "ix_tmp" not in _indexes()
+
+
+def test_adopt_legacy_database(bare_app):
+    import sqlite3
+    with sqlite3.connect(bare_app.db_path) as conn:
+        conn.executescript(LEGACY)
+
+    with pytest.raises(click.ClickException, match="--dedupe"):
+        migrations.upgrade()
+    assert _version() is None
+
+    migrations.upgrade(dedupe=True)
+    assert _version() == migrations.head()
+    rows = db.session.execute(db.select(DiaryEntry.id, DiaryEntry.tmdb_id).order_by(DiaryEntry.id)).all()
+    assert [tuple(r) for r in rows] == [(1, 603), (2, None)]  # keeps the oldest duplicate
+
+    # stats were rebuilt during adoption, so the first edit moves them correctly
+    client = bare_app.test_client()
+    assert client.get("/api/stats").json["rating_histogram"] == {"7": 1, "8": 1}
+    client.patch("/api/diary/2", json={"rating": 9})
+    assert client.get("/api/stats").json["rating_histogram"] == {"8": 1, "9": 1}
+
+
+def test_offline_sql_and_cli(bare_app):
+    pg = migrations.upgrade_sql(0, None, "postgresql")
+    assert "DESC NULLS LAST" in pg and "LIKE 'letterboxd:%'" in pg and pg.count("COMMIT;") == migrations.head()
+    from_1 = migrations.upgrade_sql(1, None, "sqlite")
+    assert "-- 2:" in from_1 and "-- 1:" not in from_1
+
+    runner = bare_app.test_cli_runner()
+    assert "Not versioned" in runner.invoke(args=["db-current"]).output
+    assert runner.invoke(args=["db-stamp", "1"]).exit_code == 0  # e.g. baseline applied by hand
+    assert runner.invoke(args=["db-current"]).output.strip() == "1, 1 pending"
+    assert runner.invoke(args=["db-stamp", "99"]).exit_code != 0
+    history = runner.invoke(args=["db-history"]).output.splitlines()
+    assert history[0].startswith("*") and history[1].startswith(" ")
+
+
+@pytest.mark.parametrize("dialect, columns", [
+    ("sqlite", "(date_watched, created_at, id)"),
+    ("postgresql", "(date_watched DESC NULLS LAST, created_at DESC, id DESC)"),
+])
+def test_model_declares_ix_diary_order_like_the_migrations(dialect, columns):
+    from sqlalchemy import create_mock_engine
+    ddl = []
+    engine = create_mock_engine(f"{dialect}://", lambda sql, *a, **kw: ddl.append(str(sql.compile(dialect=engine.dialect))))
+    db.metadata.create_all(engine, tables=[DiaryEntry.__table__], checkfirst=False)
+    assert [d.strip() for d in ddl if "ix_diary_order" in d] == [f"CREATE INDEX ix_diary_order ON diary_entries {columns}"]
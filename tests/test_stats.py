@@ -0,0 +1,89 @@
+import io
+
+import pytest
+
+from extensions import db
+from models import DiaryStat, rebuild_stats
+from views import imports
+
+CSV = ("Date,Name,Year,Letterboxd URI,Rating,Rewatch,Tags,Watched Date\n"
+       "x,Alien,1979,https://boxd.it/a,4,,,2023-12-30\n"
+       "x,Heat,1995,https://boxd.it/h,3,,,\n"
+       "x,Ran,1985,https://boxd.it/r,5,,,2024-03-01\n")
+
+
+@pytest.fixture(autouse=True)
+def no_posters(monkeypatch):
+    monkeypatch.setattr(imports, "tmdb_posters_for_movies", lambda keys: {k: None for k in keys})
+
+
+def _stats():
+    return sorted((s.period, s.metric, s.bucket, s.n, s.total)
+                  for s in db.session.scalars(db.select(DiaryStat)) if s.n)
+
+
+def _assert_matches_rebuild():
+    live = _stats()
+    rebuild_stats()
+    db.session.commit()
+    assert live == _stats()
+
+
+def _add(client, **entry):
+    r = client.post("/api/diary", json={"kind": "movie", "title": "Film", **entry})
+    assert r.status_code == 201
+    return r.json["entry"]["id"]
+
+
+def test_every_write_path_keeps_stats_in_step(app, client):
+    a = _add(client, date_watched="2024-01-05", rating=7)
+    b = _add(client, date_watched="2024-01-20", rating=9)
+    _add(client, rating=4)  # undated
+    _assert_matches_rebuild()
+
+    client.patch(f"/api/diary/{a}", json={"rating": 3, "date_watched": "2023-06-01"})
+    _assert_matches_rebuild()
+    client.post(f"/entry/{b}/edit", data={"date_watched": "", "rating": "", "review": ""})
+    _assert_matches_rebuild()
+    client.delete(f"/api/diary/{a}")
+    _assert_matches_rebuild()
+
+    imports.ingest_letterboxd(io.BytesIO(CSV.encode()))
+    _assert_matches_rebuild()
+    imports.ingest_letterboxd(io.BytesIO(CSV.replace("boxd.it/r,5", "boxd.it/r,1").encode()), mode="update")
+    _assert_matches_rebuild()
+
+    client.post("/api/diary/batch", json=[{"op": "create", "kind": "movie", "title": "X", "rating": 2,
+                                           "date_watched": "2024-03-09"},
+                                          {"op": "update", "id": b, "rating": 6},
+                                          {"op": "delete", "id": b}])
+    _assert_matches_rebuild()
+
+
+def test_stats_endpoint(app, client):
+    imports.ingest_letterboxd(io.BytesIO(CSV.encode()))
+    _add(client, date_watched="2024-03-15", rating=6)
+
+    s = client.get("/api/stats").json
+    assert s["years"] == [{"year": "2023", "watched": 1, "avg_rating": 8.0},
+                          {"year": "2024", "watched": 2, "avg_rating": 8.0},
+                          {"year": "undated", "watched": 1, "avg_rating": 6.0}]
+    assert s["films_per_month"] == {"2023-12": 1, "2024-03": 2}
+    assert s["rating_histogram"] == {"6": 2, "8": 1, "10": 1}
+    assert s["decades"] == [{"decade": 1970, "watched": 1}, {"decade": 1980, "watched": 1},
+                            {"decade": 1990, "watched": 1}]
+
+    s = client.get("/api/stats?year=2024").json
+    assert [y["year"] for y in s["years"]] == ["2024"]
+    assert s["films_per_month"] == {"2024-03": 2}
+    assert client.get("/api/stats?year=abc").status_code == 400
+
+
+def test_rebuild_stats_command(app):
+    imports.ingest_letterboxd(io.BytesIO(CSV.encode()))
+    expected = _stats()
+    db.session.execute(DiaryStat.__table__.delete())
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=["rebuild-stats"])
+    assert result.exit_code == 0 and "Rebuilt" in result.output
+    assert _stats() == expected
@@ -0,0 +1,128 @@
+import gzip, io, json, os, sqlite3, threading
+
+import requests
+
+from matching import norm_title
+
+IMG_BASE = "https://image.tmdb.org/t/p"
+
+
+class TitleIndex:
+    """Local TMDb title lookup: normalized title (+ year) -> TMDb id / poster.
+
+    Lives in its own SQLite file so it works whatever DATABASE_URL points at.
+    Loaded from TMDb's daily ID exports (id + original title + popularity) or
+    from a richer local dump that also carries year and poster_path; see load().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as c:
+            c.execute("""CREATE TABLE IF NOT EXISTS titles (
+                kind TEXT NOT NULL, tmdb_id INTEGER NOT NULL, title TEXT NOT NULL,
+                norm TEXT NOT NULL, year INTEGER, poster_path TEXT, popularity REAL,
+                PRIMARY KEY (kind, tmdb_id))""")
+            c.execute("CREATE INDEX IF NOT EXISTS ix_titles_norm ON titles (kind, norm, year)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+
+    # --- loading ---
+    @staticmethod
+    def _open(source):
+        """Path or http(s) URL, gzip or plain -> text lines."""
+        if source.startswith(("http://", "https://")):
+            r = requests.get(source, stream=True, timeout=(5, 60))
+            r.raise_for_status()
+            raw = r.raw
+            raw.decode_content = True
+        else:
+            raw = open(source, "rb")
+        head = raw.peek(2)[:2] if hasattr(raw, "peek") else b""
+        if source.endswith(".gz") or head == b"\x1f\x8b":
+            raw = gzip.GzipFile(fileobj=raw)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+
+    @staticmethod
+    def _row(d: dict, kind: str):
+        title = d.get("title") or d.get("name") or d.get("original_title") or d.get("original_name")
+        if not title or not d.get("id"):
+            return None
+        year = d.get("year")
+        date = d.get("release_date") or d.get("first_air_date") or ""
+        if not year and date[:4].isdigit():
+            year = int(date[:4])
+        return (kind, int(d["id"]), title, norm_title(title), year,
+                d.get("poster_path"), d.get("popularity"))
+
+    def load(self, source: str, kind: str = "movie", batch: int = 5000) -> int:
+        """Upsert every NDJSON line in `source`; returns rows loaded."""
+        sql = ("INSERT OR REPLACE INTO titles (kind, tmdb_id, title, norm, year, poster_path, popularity) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?)")
+        conn, rows, total = self._conn(), [], 0
+        with self._open(source) as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = self._row(json.loads(line), kind)
+                except (ValueError, TypeError):
+                    continue
+                if row:
+                    rows.append(row)
+                if len(rows) >= batch:
+                    with conn:
+                        conn.executemany(sql, rows)
+                    total += len(rows)
+                    rows = []
+        if rows:
+            with conn:
+                conn.executemany(sql, rows)
+            total += len(rows)
+        return total
+
+    def set_poster(self, kind: str, tmdb_id: int, poster_path: str | None, year: int | None = None):
+        with self._conn() as c:
+            c.execute("UPDATE titles SET poster_path = ?, year = COALESCE(year, ?) "
+                      "WHERE kind = ? AND tmdb_id = ?", (poster_path, year, kind, tmdb_id))
+
+    # --- lookups ---
+    def find(self, title: str, year: int | None = None, kind: str = "movie") -> dict | None:
+        """Unambiguous exact (normalized) title hit, or None.
+
+        With a year we take the same year, then +/-1; rows without a year only
+        count when they're the only title with that name. Without a year the
+        most popular title with that name wins.
+        """
+        rows = self._conn().execute(
+            "SELECT tmdb_id, title, year, poster_path FROM titles WHERE kind = ? AND norm = ? "
+            "ORDER BY popularity DESC", (kind, norm_title(title))).fetchall()
+        if not rows:
+            return None
+        pick = None
+        if year:
+            pick = (next((r for r in rows if r["year"] == year), None)
+                    or next((r for r in rows if r["year"] and abs(r["year"] - year) == 1), None))
+            if pick is None and len(rows) == 1 and rows[0]["year"] is None:
+                pick = rows[0]
+        else:
+            pick = rows[0]
+        if pick is None:
+            return None
+        return {"id": pick["tmdb_id"], "title": pick["title"], "year": pick["year"],
+                "poster_path": pick["poster_path"]}
+
+    @staticmethod
+    def poster_url(poster_path, size="w500"):
+        return f"{IMG_BASE}/{size}{poster_path}" if poster_path else None
@@ -1,27 +1,214 @@
-import os, requests
+import os, json, random, threading, time, requests
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-API3 = "https://api.themoviedb.org/3"
+# overridable so benchmarks / load tests can point at a local stand-in (bench/mock_tmdb.py)
+API3 = os.environ.get("TMDB_API_BASE", "https://api.themoviedb.org/3").rstrip("/")
 IMG_BASE = "https://image.tmdb.org/t/p"
 
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# (path prefix, ttl seconds, stale-while-revalidate window) - first match wins.
+# Search results shift as TMDb popularity changes; details/credits barely move.
+CACHE_TTLS = [
+    ("/search/", 1 * HOUR, 1 * DAY),
+    ("/movie/", 7 * DAY, 30 * DAY),
+    ("/tv/", 3 * DAY, 30 * DAY),
+]
+DEFAULT_TTL = (1 * HOUR, 1 * DAY)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Token bucket: refills `rate` tokens/sec, holds at most `burst`.
+
+    TMDb allows roughly 40-50 requests/sec per IP; staying under that on our
+    side means bulk jobs slow down a little instead of collecting 429s.
+    """
+
+    def __init__(self, rate: float = 35.0, burst: int = 20):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_after(resp) -> float | None:
+    val = resp.headers.get("Retry-After") if resp is not None else None
+    if val and val.strip().isdigit():
+        return float(val.strip())
+    return None
+
+
+class LatencyTracker:
+    """Keeps the last `window` durations (ms) per call name for p50/p95 readouts."""
+
+    def __init__(self, window: int = 500):
+        self._samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ms: float):
+        with self._lock:
+            self._samples[name].append(ms)
+
+    def summary(self) -> dict:
+        out = {}
+        with self._lock:
+            items = [(k, sorted(v)) for k, v in self._samples.items()]
+        for name, vals in items:
+            if not vals:
+                continue
+            pick = lambda q: vals[min(len(vals) - 1, int(q * len(vals)))]
+            out[name] = {"count": len(vals), "p50_ms": round(pick(0.50), 1),
+                         "p95_ms": round(pick(0.95), 1), "max_ms": round(vals[-1], 1)}
+        return out
+
+
 class TMDBClient:
-    def __init__(self, bearer: str | None = None, api_key: str | None = None, language="en-US"):
+    def __init__(self, bearer: str | None = None, api_key: str | None = None, language="en-US",
+                 cache=None, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 15, max_retries: int = 3, backoff: float = 0.5,
+                 rate_limiter: RateLimiter | None = None):
         if not bearer and not api_key:
             raise RuntimeError("Set TMDB_BEARER or TMDB_API_KEY in your environment.")
         self.bearer = bearer
         self.api_key = api_key
         self.language = language
+        self.cache = cache  # cache.ResponseCache or None
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.pool_size = pool_size
+
+        # one keep-alive pool for every call instead of a TLS handshake per request;
+        # retries are handled in _fetch so Retry-After and the rate limiter apply
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self._headers())
+        # for the few sub-resources that can't ride along with append_to_response
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tmdb")
+        self.latency = LatencyTracker()
+        # callables(name, ms, info) run after every _get; info has cache/status/attempts
+        self.observers = []
+        self._call = threading.local()
+        self._refreshing: set[str] = set()
+        self._refresh_lock = threading.Lock()
 
     def _headers(self):
         return {"Authorization": f"Bearer {self.bearer}"} if self.bearer else {}
 
+    def _ttl_for(self, path):
+        for prefix, ttl, stale in CACHE_TTLS:
+            if path.startswith(prefix):
+                return ttl, stale
+        return DEFAULT_TTL
+
+    def _cache_key(self, path, params):
+        # None params are dropped by requests anyway; credentials never go in the key
+        norm = {k: str(v) for k, v in params.items() if v is not None and k != "api_key"}
+        return f"{path}?{json.dumps(norm, sort_keys=True)}"
+
+    def _sleep_before_retry(self, attempt, resp=None):
+        # exponential backoff with full jitter, unless the server told us how long
+        delay = _retry_after(resp)
+        if delay is None:
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+        time.sleep(min(delay, 60))
+
+    def _fetch(self, path, params):
+        url = f"{API3}{path}"
+        info = getattr(self._call, "info", None) or {}
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            info["attempts"] = attempt + 1
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                info["status"] = "error"
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+            info["status"] = r.status_code
+            if r.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                self._sleep_before_retry(attempt, r)
+                continue
+            r.raise_for_status()
+            return r.json()
+
+    def _refresh(self, key, path, params):
+        try:
+            self.cache.set(key, self._fetch(path, params))
+        except Exception:
+            pass  # keep serving the stale copy
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
     def _get(self, path, **params):
+        started = time.perf_counter()
+        info = self._call.info = {"cache": "off" if self.cache is None else "miss",
+                                  "status": None, "attempts": 0}
+        try:
+            return self._get_cached(path, params)
+        finally:
+            self._call.info = None
+            # bucket by endpoint shape, not id: /movie/123/credits -> /movie/{id}/credits
+            name = "/".join("{id}" if p.isdigit() else p for p in path.split("/"))
+            ms = (time.perf_counter() - started) * 1000
+            self.latency.record(name, ms)
+            for fn in self.observers:
+                try:
+                    fn(name, ms, info)
+                except Exception:
+                    pass  # metrics must never break a TMDb call
+
+    def _get_cached(self, path, params):
         if self.api_key and "api_key" not in params:
             params["api_key"] = self.api_key
         if "language" not in params:
             params["language"] = self.language
-        r = requests.get(f"{API3}{path}", headers=self._headers(), params=params, timeout=20)
-        r.raise_for_status()
-        return r.json()
+        if self.cache is None:
+            return self._fetch(path, params)
+
+        key = self._cache_key(path, params)
+        ttl, stale_ttl = self._ttl_for(path)
+        hit = self.cache.get(key, ttl, stale_ttl)
+        if hit is not None:
+            data, stale = hit
+            self._call.info["cache"] = "stale" if stale else "hit"
+            if stale:
+                # stale-while-revalidate: answer now, refresh once in the background
+                with self._refresh_lock:
+                    start = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start:
+                    threading.Thread(target=self._refresh, args=(key, path, dict(params)),
+                                     daemon=True).start()
+            return data
+
+        data = self._fetch(path, params)
+        self.cache.set(key, data)
+        return data
 
     def _poster_url(self, poster_path, size="w500"):
         return f"{IMG_BASE}/{size}{poster_path}" if poster_path else None
@@ -50,13 +237,29 @@ class TMDBClient:
             })
         return results
 
-    def get_movie(self, movie_id: int):
-        d = self._get(f"/movie/{movie_id}")
-        # fetch credits separately (more reliable than append)
+    def _timed(self, name, fn, *args):
+        started = time.perf_counter()
         try:
-            credits = self._get(f"/movie/{movie_id}/credits")
-        except Exception:
-            credits = {}
+            return fn(*args)
+        finally:
+            self.latency.record(name, (time.perf_counter() - started) * 1000)
+
+    def get_movie(self, movie_id: int):
+        return self._timed("get_movie", self._get_movie, movie_id)
+
+    def get_series(self, tv_id: int):
+        return self._timed("get_series", self._get_series, tv_id)
+
+    def _get_movie(self, movie_id: int):
+        # details + credits in one round trip
+        d = self._get(f"/movie/{movie_id}", append_to_response="credits")
+        credits = d.get("credits")
+        if credits is None:
+            # append occasionally drops a sub-resource; fall back to the direct call
+            try:
+                credits = self._get(f"/movie/{movie_id}/credits")
+            except Exception:
+                credits = {}
 
         cast = []
         for p in (credits or {}).get("cast", [])[:20]:
@@ -119,24 +322,33 @@ class TMDBClient:
     def _profile_url(self, path, size="w185"):
         return f"{IMG_BASE}/{size}{path}" if path else None
 
-    def get_series(self, tv_id: int):
-        # Base details
-        d = self._get(f"/tv/{tv_id}")
+    def _series_credits(self, tv_id: int, d: dict):
+        """aggregate_credits if TMDb gave it to us, else plain credits, else {}."""
+        if d.get("aggregate_credits") is not None:
+            return d["aggregate_credits"]
+        if d.get("credits") is not None:
+            return d["credits"]
+        # neither came back appended: ask for both at once and keep the old preference
+        agg = self._pool.submit(self._get, f"/tv/{tv_id}/aggregate_credits")
+        plain = self._pool.submit(self._get, f"/tv/{tv_id}/credits")
+        for fut in (agg, plain):
+            try:
+                return fut.result()
+            except Exception:
+                continue
+        return {}
+
+    def _get_series(self, tv_id: int):
+        # Base details with both credit flavours appended
+        d = self._get(f"/tv/{tv_id}", append_to_response="aggregate_credits,credits")
         title = d.get("name") or d.get("title") or "Untitled"
         poster = self._poster_url(d.get("poster_path"))
         genres = [g["name"] for g in d.get("genres", []) if g.get("name")]
         companies = [c["name"] for c in d.get("production_companies", []) if c.get("name")]
         year = (d.get("first_air_date") or "").split("-", 1)[0] or None
 
-        # Credits: try aggregate_credits, fall back to credits
-        credits = {}
-        try:
-            credits = self._get(f"/tv/{tv_id}/aggregate_credits")
-        except Exception:
-            try:
-                credits = self._get(f"/tv/{tv_id}/credits")
-            except Exception:
-                credits = {}
+        # Credits: prefer aggregate_credits, fall back to credits
+        credits = self._series_credits(tv_id, d)
 
         cast_src = (credits or {}).get("cast", []) or []
         cast = []
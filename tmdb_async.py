@@ -0,0 +1,86 @@
+import asyncio, threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from tmdb import TMDBClient
+
+
+class AsyncTMDBClient:
+    """asyncio front-end for a TMDBClient.
+
+    Exposes the same `_get`/`search`/`get_movie`/`get_series` surface as
+    coroutines. Calls run on a bounded executor over the wrapped client, so
+    they share its keep-alive pool, cache and rate limiter; `concurrency`
+    caps how many requests are in flight at once.
+    """
+
+    def __init__(self, client: TMDBClient, concurrency: int | None = None):
+        self.client = client
+        self.concurrency = concurrency or client.pool_size
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                            thread_name_prefix="tmdb-async")
+        self._sems: dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+    def _sem(self):
+        loop = asyncio.get_running_loop()
+        sem = self._sems.get(loop)
+        if sem is None:
+            sem = self._sems[loop] = asyncio.Semaphore(self.concurrency)
+        return sem
+
+    async def _call(self, fn, *args, **kwargs):
+        async with self._sem():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def _get(self, path, **params):
+        return await self._call(self.client._get, path, **params)
+
+    async def search(self, query: str, page=1):
+        return await self._call(self.client.search, query, page=page)
+
+    async def get_movie(self, movie_id: int):
+        return await self._call(self.client.get_movie, movie_id)
+
+    async def get_series(self, tv_id: int):
+        return await self._call(self.client.get_series, tv_id)
+
+    def _poster_url(self, poster_path, size="w500"):
+        return self.client._poster_url(poster_path, size)
+
+
+class TMDBBatchRunner:
+    """Sync facade: runs batches of coroutines on one shared background loop.
+
+    Flask views and CLI commands are synchronous, so they hand a list of
+    coroutine factories to `run()` and block until every result is in.
+    """
+
+    def __init__(self, aclient: AsyncTMDBClient):
+        self.aclient = aclient
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="tmdb-loop",
+                                 daemon=True).start()
+        return self._loop
+
+    def run(self, factories, return_exceptions: bool = True) -> list:
+        """`factories` is an iterable of callables `f(aclient) -> coroutine`.
+
+        Results come back in input order; failures are returned as exception
+        objects unless return_exceptions=False.
+        """
+        async def _all():
+            return await asyncio.gather(*(f(self.aclient) for f in factories),
+                                        return_exceptions=return_exceptions)
+        fut = asyncio.run_coroutine_threadsafe(_all(), self._ensure_loop())
+        return fut.result()
+
+    def map(self, coro_fn, items, return_exceptions: bool = True) -> list:
+        """run() shorthand: coro_fn(aclient, item) for every item."""
+        return self.run([lambda a, it=it: coro_fn(a, it) for it in items], return_exceptions)
@@ -0,0 +1 @@
+"""Blueprints: diary pages + API, Letterboxd import, item/search pages, PWA files."""
@@ -0,0 +1,533 @@
+import base64
+import io
+import json
+import zlib
+from datetime import datetime
+from itertools import groupby
+
+from flask import Blueprint, Response, abort, jsonify, redirect, render_template, request, stream_with_context, url_for
+from sqlalchemy import and_, or_, text
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from http_cache import conditional, diary_validator, entry_validator
+from models import (DiaryEntry, DiaryStat, _FTS_PG, _FTS_SQLITE, diary_version, rebuild_stats,
+                    search_diary)
+
+bp = Blueprint("diary", __name__, cli_group=None)
+
+
+def _latest_query(limit=12):
+    return db.select(DiaryEntry).order_by(DiaryEntry.created_at.desc()).limit(limit)
+
+
+@bp.route("/")
+@conditional(diary_validator, fragment=True)
+def index():
+    latest = db.session.scalars(_latest_query()).all()
+    return render_template("index.html", latest=latest)
+
+
+@bp.route("/api/diary/search")
+def api_diary_search():
+    q = request.args.get("q", "").strip()
+    try:
+        limit = _page_limit(20, maximum=100)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"entries": [e.to_dict() for e in search_diary(q, limit)]})
+
+
+# --- Diary listing (keyset pagination) ---
+# Pages are ordered date_watched DESC (undated last), created_at DESC, id DESC and
+# continue from an opaque cursor holding the last row's sort key. Each bound leads
+# with a plain comparison on the index's first column, so a page is an index range
+# seek however deep it is; undated entries are a second query, run once the dated
+# rows are used up.
+DIARY_PAGE_SIZE = 50
+DIARY_MAX_PAGE_SIZE = 500
+DIARY_FIELDS = ("id", "external_id", "kind", "title", "poster_url",
+                "date_watched", "rating", "review", "created_at")
+
+
+def _encode_cursor(date_watched, created_at, entry_id) -> str:
+    raw = json.dumps([date_watched.isoformat() if date_watched else None,
+                      created_at.isoformat(), entry_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    """(date_watched, created_at, id) from a cursor; ValueError if it's not one of ours."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        d, c, i = json.loads(raw)
+        return (datetime.fromisoformat(d).date() if d else None,
+                datetime.fromisoformat(c), int(i))
+    except Exception:
+        raise ValueError("Bad cursor.") from None
+
+
+def _after(col, value, rest):
+    """Keyset bound `col` DESC past `value`: col <= value AND (col < value OR (col = value AND rest))."""
+    return and_(col <= value, or_(col < value, and_(col == value, rest)))
+
+
+def _diary_page_queries(cols, cursor=None):
+    """SELECT cols ... for the dated and then the undated part of the diary past `cursor`."""
+    E = DiaryEntry
+    order = (E.date_watched.desc().nullslast(), E.created_at.desc(), E.id.desc())
+    dated = db.select(*cols).where(E.date_watched.is_not(None)).order_by(*order)
+    undated = db.select(*cols).where(E.date_watched.is_(None)).order_by(*order)
+    if not cursor:
+        return [dated, undated]
+    d, c, i = _decode_cursor(cursor)
+    after_in_day = _after(E.created_at, c, E.id < i)
+    if d is None:
+        return [undated.where(after_in_day)]
+    return [dated.where(_after(E.date_watched, d, after_in_day)), undated]
+
+
+def _diary_page(run, cols, cursor=None, limit=DIARY_PAGE_SIZE):
+    """Up to limit+1 rows (one extra to know if there's more); `run` is session.scalars or .execute."""
+    rows = []
+    for q in _diary_page_queries(cols, cursor):
+        rows += run(q.limit(limit + 1 - len(rows))).all()
+        if len(rows) > limit:
+            break
+    return rows
+
+
+def _page_limit(default=DIARY_PAGE_SIZE, maximum=DIARY_MAX_PAGE_SIZE):
+    """?limit= clamped to 1..maximum; ValueError if it isn't a number."""
+    try:
+        return max(1, min(int(request.args.get("limit") or default), maximum))
+    except ValueError:
+        raise ValueError("limit must be an integer.") from None
+
+
+@bp.route("/diary")
+@conditional(diary_validator, fragment=True)
+def diary():
+    try:
+        limit = _page_limit()
+        entries = _diary_page(db.session.scalars, [DiaryEntry], request.args.get("cursor"), limit)
+    except ValueError as e:
+        abort(400, description=str(e))
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        next_cursor = _encode_cursor(last.date_watched, last.created_at, last.id)
+    groups = []
+    for date, it in groupby(entries, key=lambda e: e.date_watched):
+        groups.append({"date": date, "entries": list(it)})
+    if request.args.get("partial"):
+        # infinite scroll asks for just the next chunk of groups
+        return render_template("_diary_groups.html", groups=groups, next_cursor=next_cursor)
+    return render_template("diary.html", groups=groups, next_cursor=next_cursor)
+
+@bp.route("/api/diary", methods=["GET"])
+@conditional(diary_validator)
+def api_diary_list():
+    """Paged diary: ?limit=&cursor=&fields=id,title,... -> {entries, next_cursor}."""
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()] or list(DIARY_FIELDS)
+    unknown = set(fields) - set(DIARY_FIELDS)
+    if unknown:
+        return jsonify({"ok": False, "error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+    # only the projected columns are loaded, plus whatever the cursor needs
+    sort_cols = ("date_watched", "created_at", "id")
+    cols = [getattr(DiaryEntry, f) for f in dict.fromkeys([*fields, *sort_cols])]
+    try:
+        limit = _page_limit()
+        rows = _diary_page(db.session.execute, cols, request.args.get("cursor"), limit)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].date_watched, rows[-1].created_at, rows[-1].id)
+    entries = []
+    for r in rows:
+        m = r._mapping
+        entries.append({f: (m[f].isoformat() if f in ("date_watched", "created_at") and m[f] else m[f])
+                        for f in fields})
+    return jsonify({"entries": entries, "next_cursor": next_cursor})
+
+# --- Diary export (streaming) ---
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "json": ("application/json", "json"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+EXPORT_BATCH = 1000
+
+
+def _export_rows():
+    """Every diary row as a plain dict, fetched EXPORT_BATCH at a time."""
+    cols = [getattr(DiaryEntry, f) for f in DIARY_FIELDS] + [DiaryEntry.release_year]
+    q = db.select(*cols).order_by(DiaryEntry.id).execution_options(yield_per=EXPORT_BATCH)
+    for r in db.session.execute(q):
+        d = dict(r._mapping)
+        for k in ("date_watched", "created_at"):
+            d[k] = d[k].isoformat() if d[k] else None
+        yield d
+
+
+def _export_chunks(fmt):
+    if fmt == "ndjson":
+        for d in _export_rows():
+            yield json.dumps(d, ensure_ascii=False) + "\n"
+    elif fmt == "json":
+        yield "["
+        for n, d in enumerate(_export_rows()):
+            yield ("," if n else "") + json.dumps(d, ensure_ascii=False)
+        yield "]\n"
+    else:
+        import csv  # only exports need it
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow([*DIARY_FIELDS, "release_year"])
+        for d in _export_rows():
+            w.writerow([d[f] if d[f] is not None else "" for f in (*DIARY_FIELDS, "release_year")])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        yield buf.getvalue()
+
+
+def _buffered(chunks, size=64 * 1024):
+    # coalesce per-row strings into ~64KB writes
+    out, n = [], 0
+    for c in chunks:
+        out.append(c)
+        n += len(c)
+        if n >= size:
+            yield "".join(out).encode("utf-8")
+            out, n = [], 0
+    if out:
+        yield "".join(out).encode("utf-8")
+
+
+def _gzipped(chunks):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for c in chunks:
+        data = z.compress(c)
+        if data:
+            yield data
+    yield z.flush()
+
+
+@bp.route("/api/diary/export")
+def api_diary_export():
+    """Whole diary as ndjson (default), json or csv, streamed in flat memory."""
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"ok": False, "error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    mimetype, ext = EXPORT_FORMATS[fmt]
+
+    # the body only changes when the diary does, so the version is a good validator;
+    # gzip and identity bodies differ, so each gets its own tag
+    use_gzip = "gzip" in request.accept_encodings
+    etag = f"diary-{diary_version()}-{fmt}" + ("-gz" if use_gzip else "")
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag, weak=True)
+        resp.headers["Vary"] = "Accept-Encoding"
+        return resp
+
+    body = _buffered(_export_chunks(fmt))
+    if use_gzip:
+        body = _gzipped(body)
+    resp = Response(stream_with_context(body), mimetype=mimetype)
+    resp.set_etag(etag, weak=True)
+    resp.headers["Content-Disposition"] = f'attachment; filename="diary.{ext}"'
+    resp.headers["Vary"] = "Accept-Encoding"
+    if use_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    return resp
+
+
+@bp.route("/api/stats")
+def api_stats():
+    """Year-in-review numbers from diary_stats; ?year=2024 narrows to one year."""
+    year = request.args.get("year", "").strip()
+    if year and not (year.isdigit() or year == "undated"):
+        return jsonify({"ok": False, "error": "year must be a year or 'undated'"}), 400
+    q = db.select(DiaryStat).where(DiaryStat.n != 0)
+    if year:
+        q = q.where(or_(DiaryStat.period == year, DiaryStat.period.like(f"{year}-%")))
+    years, months, ratings, decades = {}, {}, {}, {}
+    for st in db.session.scalars(q):
+        if st.metric == "watched" and "-" in st.period:
+            months[st.period] = st.n
+        elif st.metric == "watched":
+            years.setdefault(st.period, {"year": st.period, "watched": 0, "avg_rating": None})["watched"] = st.n
+        elif st.metric == "rating_sum":
+            years.setdefault(st.period, {"year": st.period, "watched": 0, "avg_rating": None})[
+                "avg_rating"] = round(st.total / st.n, 2)
+        elif st.metric == "rating":
+            ratings[st.bucket] = ratings.get(st.bucket, 0) + st.n
+        elif st.metric == "decade":
+            decades[st.bucket] = decades.get(st.bucket, 0) + st.n
+    return jsonify({
+        "years": sorted(years.values(), key=lambda y: y["year"]),
+        "films_per_month": dict(sorted(months.items())),
+        "rating_histogram": {str(k): ratings[k] for k in sorted(ratings)},
+        "decades": [{"decade": d, "watched": n}
+                    for d, n in sorted(decades.items(), key=lambda kv: (-kv[1], kv[0]))],
+    })
+
+
+# --- Diary writes ---
+def _parse_date(val):
+    return datetime.fromisoformat(val).date() if val else None
+
+
+def _parse_rating(val):
+    if val in (None, ""):
+        return None
+    rating = int(val)
+    if not 1 <= rating <= 10:
+        raise ValueError("rating must be between 1 and 10")
+    return rating
+
+
+def _check_text(data, *keys):
+    """TypeError unless `data` is a JSON object whose `keys`, when set, are strings."""
+    if not isinstance(data, dict):
+        raise TypeError("expected a JSON object")
+    for k in keys:
+        if data.get(k) is not None and not isinstance(data[k], str):
+            raise TypeError(f"{k} must be a string")
+
+
+def _new_entry(data: dict) -> DiaryEntry:
+    """DiaryEntry from a POST /api/diary payload; ValueError/TypeError when invalid."""
+    _check_text(data, "kind", "title", "poster_url", "review")
+    for k in ("kind", "title"):
+        if not str(data.get(k) or "").strip():
+            raise ValueError(f"{k} is required")
+    external_id = data.get("external_id")
+    # a bare TMDb id may come as a number; anything else must be a string
+    if external_id is not None and type(external_id) not in (str, int):
+        raise TypeError("external_id must be a string")
+    external_id = str(external_id or "")
+    return DiaryEntry(
+        external_id=external_id,
+        tmdb_id=int(external_id) if external_id.isdigit() else None,
+        kind=data["kind"],
+        title=data["title"],
+        poster_url=data.get("poster_url"),
+        date_watched=_parse_date(data.get("date_watched")),
+        rating=_parse_rating(data.get("rating")),
+        review=data.get("review", "")
+    )
+
+
+def _entry_changes(data: dict) -> dict:
+    """{column: value} for the fields a PATCH payload sets; a blank title is ignored."""
+    _check_text(data, "title", "review")
+    out = {}
+    if str(data.get("title") or "").strip():
+        out["title"] = data["title"].strip()
+    if "date_watched" in data:
+        out["date_watched"] = _parse_date(data["date_watched"])
+    if "rating" in data:
+        out["rating"] = _parse_rating(data["rating"])
+    if "review" in data:
+        out["review"] = (data["review"] or "").strip() or None
+    return out
+
+
+@bp.route("/api/diary", methods=["POST"])
+def api_diary_add():
+    data = request.get_json(force=True)
+    try:
+        entry = _new_entry(data)
+        db.session.add(entry)
+        db.session.commit()
+        return jsonify({"ok": True, "entry": entry.to_dict()}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+@bp.route("/api/diary/<int:entry_id>", methods=["GET"])
+@conditional(entry_validator)
+def api_diary_entry(entry_id):
+    return jsonify({"entry": db.get_or_404(DiaryEntry, entry_id).to_dict()})
+
+
+@bp.route("/api/diary/<int:entry_id>", methods=["DELETE"])
+def api_diary_delete(entry_id):
+    entry = DiaryEntry.query.get_or_404(entry_id)
+    db.session.delete(entry)
+    db.session.commit()
+    return jsonify({"ok": True})
+
+
+@bp.route("/entry/<int:entry_id>/poster", methods=["POST"])
+def set_poster(entry_id):
+    e = DiaryEntry.query.get_or_404(entry_id)
+    url = (request.form.get("poster_url") or "").strip()
+    if url:
+        e.poster_url = url
+        db.session.commit()
+    return redirect(url_for(".edit_entry", entry_id=entry_id))
+
+
+@bp.route("/entry/<int:entry_id>/edit", methods=["GET", "POST"])
+def edit_entry(entry_id):
+    e = DiaryEntry.query.get_or_404(entry_id)
+    if request.method == "POST":
+        # same checks as PATCH /api/diary/<id>; a field left out of the form clears it
+        data = {"date_watched": "", "rating": "", "review": "",
+                **{k: v.strip() for k, v in request.form.items()}}
+        try:
+            changes = _entry_changes(data)
+        except (ValueError, TypeError) as err:
+            return render_template("entry_edit.html", e=e, error=str(err)), 400
+        for k, v in changes.items():
+            setattr(e, k, v)
+        db.session.commit()
+        # Optional: flash("Updated");
+        return redirect(url_for(".diary"))
+    return render_template("entry_edit.html", e=e, error=None)
+
+# Optional JSON update if you want API:
+@bp.route("/api/diary/<int:entry_id>", methods=["PATCH", "PUT"])
+def api_diary_update(entry_id):
+    e = DiaryEntry.query.get_or_404(entry_id)
+    try:
+        changes = _entry_changes(request.get_json(force=True))
+    except (ValueError, TypeError) as err:
+        return jsonify({"ok": False, "error": str(err)}), 400
+    for k, v in changes.items():
+        setattr(e, k, v)
+    db.session.commit()
+    return jsonify({"ok": True, "entry": e.to_dict()})
+
+
+# --- Batch writes ---
+# Creates, updates and deletes in one request and one transaction (an offline
+# log being synced, bulk re-rating). The body is a JSON array of operations,
+# or NDJSON with one per line:
+#   {"op": "create", "kind": "movie", "title": "Alien", ...}  fields as POST /api/diary
+#   {"op": "update", "id": 5, "rating": 8}                    fields as PATCH
+#   {"op": "delete", "id": 5}
+# Every op is checked before anything is written. One bad op fails the batch,
+# with [index, status, error] per problem; otherwise each op gets [status, id].
+BATCH_MAX_OPS = 5000
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class BatchError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _batch_ops() -> list:
+    """The operations in the request body; BatchError if it isn't a batch."""
+    if request.mimetype in NDJSON_TYPES:
+        ops = []
+        for n, line in enumerate(request.stream, 1):  # parsed as it arrives
+            if not line.strip():
+                continue
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                raise BatchError(f"line {n} is not valid JSON")
+            if len(ops) > BATCH_MAX_OPS:
+                raise BatchError(f"at most {BATCH_MAX_OPS} operations per batch", 413)
+        return ops
+    ops = request.get_json(force=True, silent=True)
+    if not isinstance(ops, list):
+        raise BatchError("expected a JSON array of operations (or NDJSON, one per line)")
+    if len(ops) > BATCH_MAX_OPS:
+        raise BatchError(f"at most {BATCH_MAX_OPS} operations per batch", 413)
+    return ops
+
+
+def _plan_batch(ops: list):
+    """Check every op against the diary: ([(op, entry, changes)], [[index, status, error]])."""
+    ids = {op.get("id") for op in ops if isinstance(op, dict) and op.get("op") in ("update", "delete")}
+    ids = [i for i in ids if type(i) is int]
+    existing = ({e.id: e for e in db.session.scalars(db.select(DiaryEntry).where(DiaryEntry.id.in_(ids)))}
+                if ids else {})
+    plan, errors, deleted = [], [], set()
+    for n, op in enumerate(ops):
+        kind = op.get("op") if isinstance(op, dict) else None
+        try:
+            if kind == "create":
+                plan.append((kind, _new_entry(op), None))
+            elif kind in ("update", "delete"):
+                i = op.get("id")
+                if type(i) is not int:
+                    raise ValueError("id must be an integer")
+                if i not in existing or i in deleted:
+                    errors.append([n, 404, f"entry {i} is deleted earlier in this batch" if i in deleted
+                                   else f"no entry {i}"])
+                    continue
+                if kind == "delete":
+                    deleted.add(i)
+                plan.append((kind, existing[i], _entry_changes(op) if kind == "update" else None))
+            else:
+                errors.append([n, 400, "op must be create, update or delete"])
+        except (ValueError, TypeError) as err:
+            errors.append([n, 400, str(err)])
+    return plan, errors
+
+
+@bp.route("/api/diary/batch", methods=["POST"])
+def api_diary_batch():
+    try:
+        ops = _batch_ops()
+    except BatchError as err:
+        return jsonify({"ok": False, "error": str(err)}), err.status
+    plan, errors = _plan_batch(ops)
+    if errors:
+        db.session.rollback()
+        return jsonify({"ok": False, "errors": errors}), 400
+
+    for kind, e, changes in plan:
+        if kind == "create":
+            db.session.add(e)
+        elif kind == "update":
+            for k, v in changes.items():
+                setattr(e, k, v)
+        else:
+            db.session.delete(e)
+    try:
+        db.session.flush()  # ids for the new entries; stats and version move once, here
+        results = [[{"create": 201, "update": 200, "delete": 204}[kind], e.id] for kind, e, _ in plan]
+        db.session.commit()
+    except IntegrityError as err:
+        db.session.rollback()
+        return jsonify({"ok": False, "error": str(err.orig)}), 409
+    return jsonify({"ok": True, "results": results})
+
+
+@bp.cli.command("rebuild-stats")
+def rebuild_stats_cmd():
+    """Recompute diary_stats from scratch (normally maintained on every write)."""
+    n = rebuild_stats()
+    db.session.commit()
+    print(f"Rebuilt {n} stats rows.")
+
+
+@bp.cli.command("setup-search")
+def setup_search_cmd():
+    """Create the diary full-text index on an existing database and fill it."""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        for ddl in _FTS_SQLITE:
+            db.session.execute(text(ddl))
+        db.session.execute(text("INSERT INTO diary_fts(diary_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for ddl in _FTS_PG:
+            db.session.execute(text(ddl))
+    else:
+        print(f"No full-text support for {dialect}; search falls back to LIKE.")
+        return
+    db.session.commit()
+    print("Diary search index ready.")
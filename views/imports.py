@@ -0,0 +1,558 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import click
+from flask import Blueprint, abort, current_app, jsonify, redirect, render_template, request, url_for
+from sqlalchemy import insert, update, bindparam
+
+from extensions import BASE_DIR, db, title_index, tmdb, tmdb_batch
+from models import (IMPORTED_SQL, MISSING_POSTER_SQL, DiaryEntry, ImportJob, apply_stats_delta,
+                    bump_diary_version, stats_delta)
+
+bp = Blueprint("imports", __name__, cli_group=None)
+
+
+# --- Letterboxd CSV Import ---
+def _parse_lb_date(s: str):
+    if not s: return None
+    for fmt in ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(s.strip(), fmt).date()
+        except Exception:
+            pass
+    return None
+
+def _map_lb_rating(s: str):
+    # LB 0.5..5 -> 1..10 int
+    if not s: return None
+    try:
+        f = float(str(s).strip())
+        if f <= 0: return None
+        return int(round(f * 2))
+    except Exception:
+        return None
+
+
+IMPORT_DIR = os.environ.get("IMPORT_DIR", os.path.join(BASE_DIR, "instance", "imports"))
+
+
+def _lb_row_to_entry(row) -> dict | None:
+    """One Letterboxd CSV row -> DiaryEntry kwargs (no poster yet), None if blank."""
+    title = (row.get("Name") or row.get("Title") or "").strip()
+    if not title:
+        return None
+
+    # <-- capture Letterboxd "Year" (release year)
+    release_year = None
+    y = (row.get("Year") or "").strip()
+    if y.isdigit():
+        release_year = int(y)
+
+    lb_uri = (row.get("Letterboxd URI") or row.get(
+        "Letterboxd URL") or row.get("Letterboxd Uri") or "").strip()
+    watched = _parse_lb_date(
+        row.get("Watched Date") or row.get("Date") or "")
+    rating = _map_lb_rating(row.get("Rating"))
+    tags = (row.get("Tags") or "").strip()
+    rewatch = (row.get("Rewatch") or "").strip()
+    external_id = f"letterboxd:{lb_uri}" if lb_uri else f"letterboxd:{title}:{release_year or ''}"
+
+    review_bits = []
+    if tags:
+        review_bits.append(f"Tags: {tags}")
+    if rewatch.lower().startswith("y"):
+        review_bits.append("Rewatch")
+    review = " • ".join(review_bits) if review_bits else None
+
+    return dict(
+        external_id=external_id,
+        kind="movie",
+        title=title,
+        date_watched=watched,
+        rating=rating,
+        review=review,
+        release_year=release_year,   # <-- save it
+    )
+
+
+def _iter_chunks(it, size):
+    # lists of at most `size` items, pulled lazily from `it`
+    chunk = []
+    for x in it:
+        chunk.append(x)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_lb_rows(binary_stream, counts):
+    """Lazily decode + parse a Letterboxd CSV; yields DiaryEntry kwargs per row."""
+    import csv  # only imports need it
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", errors="ignore", newline="")
+    for row in csv.DictReader(text):
+        try:
+            r = _lb_row_to_entry(row)
+        except Exception:
+            counts["rows_failed"] += 1
+            continue
+        if r:
+            yield r
+
+
+# skip: rows already in the diary are left alone (re-import is a no-op)
+# update: rating/review/title of already-imported rows are refreshed from the CSV
+IMPORT_MODES = ("skip", "update")
+_IMPORT_UPDATABLE = ("title", "rating", "review", "release_year")
+
+
+def _import_key(r):
+    return (r["external_id"], r["date_watched"])
+
+
+def _existing_import_query(ids):
+    cols = [DiaryEntry.id, DiaryEntry.external_id, DiaryEntry.date_watched,
+            *(getattr(DiaryEntry, c) for c in _IMPORT_UPDATABLE)]
+    # the LIKE is always true for imported ids; it lets the partial unique index serve the lookup
+    return db.select(*cols).where(DiaryEntry.external_id.in_(ids), db.text(IMPORTED_SQL))
+
+
+def _existing_import_rows(rows) -> dict:
+    """One query per chunk: {(external_id, date_watched): existing row} for `rows`."""
+    found = db.session.execute(_existing_import_query({r["external_id"] for r in rows}))
+    # compared in Python so undated rows (NULL date_watched) still match each other
+    return {(row.external_id, row.date_watched): row for row in found}
+
+
+def _import_insert_stmt(mode):
+    """INSERT guarded by the unique import index where the dialect supports it."""
+    name = db.engine.dialect.name
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(DiaryEntry)
+    stmt = dialect_insert(DiaryEntry)
+    target = dict(index_elements=[DiaryEntry.external_id, DiaryEntry.date_watched],
+                  index_where=db.text(IMPORTED_SQL))
+    if mode == "update":
+        # onupdate doesn't fire for ON CONFLICT; excluded.updated_at is the insert's "now"
+        return stmt.on_conflict_do_update(
+            **target, set_={c: getattr(stmt.excluded, c) for c in (*_IMPORT_UPDATABLE, "updated_at")})
+    return stmt.on_conflict_do_nothing(**target)
+
+
+def ingest_letterboxd(binary_stream, progress=None, chunk_size=None, mode="skip") -> dict:
+    """Stream a Letterboxd CSV into diary_entries in constant memory.
+
+    Rows are parsed lazily and checked against the diary one chunk at a time;
+    only new rows get a poster lookup and an INSERT, rows already imported are
+    skipped or (mode="update") updated when something changed. Each chunk is
+    one transaction. `progress(counts)` runs after every chunk. Returns the
+    final counts.
+    """
+    chunk_size = chunk_size or current_app.config["IMPORT_CHUNK_SIZE"]
+    counts = {"rows_parsed": 0, "rows_resolved": 0, "rows_inserted": 0,
+              "rows_updated": 0, "rows_skipped": 0, "rows_failed": 0}
+    poster_cache: dict[tuple[str, int | None], str | None] = {}
+    insert_stmt = _import_insert_stmt(mode)
+    table = DiaryEntry.__table__
+    update_stmt = (update(table).where(table.c.id == bindparam("_id"))
+                   .values({c: bindparam(c) for c in _IMPORT_UPDATABLE}))
+
+    for rows in _iter_chunks(_iter_lb_rows(binary_stream, counts), chunk_size):
+        counts["rows_parsed"] += len(rows)
+
+        # last occurrence wins for repeated keys inside the same file
+        by_key = {_import_key(r): r for r in rows}
+        skipped = len(rows) - len(by_key)
+        existing = _existing_import_rows(rows)
+        new_rows, changed = [], []
+        delta = {}
+        for key, r in by_key.items():
+            old = existing.get(key)
+            if old is None:
+                new_rows.append(r)
+            elif mode == "update" and any(getattr(old, c) != r[c] for c in _IMPORT_UPDATABLE):
+                changed.append({"_id": old.id, **{c: r[c] for c in _IMPORT_UPDATABLE}})
+                stats_delta(old._mapping, r, delta)
+            else:
+                skipped += 1
+
+        # posters: concurrent lookups for new titles we haven't seen yet this run
+        keys = [(r["title"], r["release_year"]) for r in new_rows]
+        poster_cache.update(tmdb_posters_for_movies(k for k in keys if k not in poster_cache))
+        counts["rows_resolved"] += len(new_rows)
+        for k, r in zip(keys, new_rows):
+            r["poster_url"] = poster_cache.get(k)
+
+        try:
+            if new_rows:
+                db.session.execute(insert_stmt, new_rows)
+            if changed:
+                db.session.execute(update_stmt, changed)
+            if new_rows or changed:
+                bump_diary_version()
+                for r in new_rows:
+                    stats_delta(None, r, delta)
+                apply_stats_delta(delta)
+            db.session.commit()  # one transaction per chunk
+            counts["rows_inserted"] += len(new_rows)
+            counts["rows_updated"] += len(changed)
+            counts["rows_skipped"] += skipped
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Import chunk of %d rows failed", len(rows))
+            counts["rows_failed"] += len(rows)
+        if progress:
+            progress(counts)
+    return counts
+
+
+def _run_import_job(app, job_id: str, path: str, mode: str = "skip"):
+    """Worker thread: run ingest_letterboxd over the staged upload."""
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        job.status = "running"
+        db.session.commit()
+
+        def save_progress(counts):
+            for k, v in counts.items():
+                setattr(job, k, v)
+            db.session.commit()
+
+        try:
+            with open(path, "rb") as fh:
+                save_progress(ingest_letterboxd(fh, progress=save_progress, mode=mode))
+            job.status = "done"
+        except Exception as e:
+            db.session.rollback()
+            job.status = "failed"
+            job.error = str(e)
+            current_app.logger.exception("Import job %s failed", job_id)
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+@bp.cli.command("import-csv")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", type=int, default=None, help="Rows per INSERT/commit.")
+@click.option("--mode", type=click.Choice(IMPORT_MODES), default="skip",
+              help="What to do with rows that were imported before.")
+def import_csv_cmd(path, chunk_size, mode):
+    """Import a Letterboxd CSV from disk (same pipeline as /import)."""
+    def report(c):
+        print(f"\r parsed {c['rows_parsed']} · inserted {c['rows_inserted']} · failed {c['rows_failed']}",
+              end="", flush=True)
+    with open(path, "rb") as fh:
+        counts = ingest_letterboxd(fh, progress=report, chunk_size=chunk_size, mode=mode)
+    print()
+    print(f"Imported {counts['rows_inserted']} rows, updated {counts['rows_updated']}, "
+          f"skipped {counts['rows_skipped']} ({counts['rows_failed']} failed).")
+
+
+@bp.route("/import", methods=["GET", "POST"])
+def import_letterboxd():
+    if request.method == "GET":
+        job = db.session.get(ImportJob, request.args["job"]) if request.args.get("job") else None
+        return render_template("import.html", job=job)
+
+    f = request.files.get("file")
+    if not f or not f.filename.lower().endswith(".csv"):
+        return render_template("import.html", error="Upload a .csv file from Letterboxd export.")
+
+    # stage to disk and hand off; the request returns right away
+    mode = request.form.get("mode", "skip")
+    if mode not in IMPORT_MODES:
+        mode = "skip"
+    job = ImportJob(id=uuid.uuid4().hex, filename=f.filename, mode=mode)
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    path = os.path.join(IMPORT_DIR, f"{job.id}.csv")
+    f.save(path)
+    db.session.add(job)
+    db.session.commit()
+    app = current_app._get_current_object()
+    threading.Thread(target=_run_import_job, args=(app, job.id, path, mode),
+                     name=f"import-{job.id[:8]}", daemon=True).start()
+    return redirect(url_for(".import_letterboxd", job=job.id))
+
+
+@bp.route("/api/import/<job_id>")
+def api_import_status(job_id):
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
+@bp.cli.command("index-titles")
+@click.argument("source")
+@click.option("--kind", type=click.Choice(["movie", "series"]), default="movie")
+def index_titles_cmd(source, kind):
+    """Load a TMDb ID export / title dump (NDJSON, .gz ok, path or URL) into the local title index.
+
+    e.g. http://files.tmdb.org/p/exports/movie_ids_MM_DD_YYYY.json.gz
+    (use --kind series with tv_series_ids_...).
+    """
+    n = title_index.load(source, kind=kind)
+    print(f"Indexed {n} {kind} titles ({len(title_index)} total).")
+
+
+# --- Poster backfill ---
+async def _backfill_search(aclient, q):
+    """q = (kind, title, year) -> normalized candidate list (empty on error)."""
+    kind, title_q, year = q
+    hit, url = await _index_poster_async(aclient, title_q, year, kind)
+    if url:
+        return [{"id": hit["id"], "title": hit["title"], "year": hit["year"], "poster": url}]
+
+    results = []
+    try:
+        if kind == "movie":
+            # /search/movie supports year and primary_release_year
+            j = await aclient._get("/search/movie", query=title_q, include_adult=False,
+                                   year=year, primary_release_year=year or None)
+            for it in j.get("results", []):
+                title = it.get("title") or it.get("name")
+                release = (it.get("release_date") or "")[:4]
+                results.append({
+                    "id": it.get("id"),
+                    "title": title,
+                    "year": int(release) if release.isdigit() else None,
+                    "poster": aclient._poster_url(it.get("poster_path"))
+                })
+        else:  # series
+            j = await aclient._get("/search/tv", query=title_q, include_adult=False,
+                                   first_air_date_year=year or None)
+            for it in j.get("results", []):
+                title = it.get("name") or it.get("title")
+                first = (it.get("first_air_date") or "")[:4]
+                results.append({
+                    "id": it.get("id"),
+                    "title": title,
+                    "year": int(first) if first.isdigit() else None,
+                    "poster": aclient._poster_url(it.get("poster_path"))
+                })
+    except Exception:
+        results = []
+    return results
+
+
+BACKFILL_CHECKPOINT = os.path.join(BASE_DIR, "instance", "backfill_posters.json")
+
+
+def _backfill_year(e):
+    year = e.date_watched.year if e.date_watched else None
+    if not year and e.external_id and e.external_id.startswith("letterboxd:"):
+        # we sometimes stored title:year in external_id when no URI
+        tail = e.external_id.split(":")[-1]
+        if tail.isdigit():
+            year = int(tail)
+    return year
+
+
+def _read_checkpoint() -> int:
+    try:
+        with open(BACKFILL_CHECKPOINT) as fh:
+            return int(json.load(fh).get("last_id", 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_checkpoint(last_id: int):
+    os.makedirs(os.path.dirname(BACKFILL_CHECKPOINT), exist_ok=True)
+    tmp = BACKFILL_CHECKPOINT + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump({"last_id": last_id, "at": datetime.utcnow().isoformat()}, fh)
+    os.replace(tmp, BACKFILL_CHECKPOINT)  # atomic, a crash never leaves half a file
+
+
+def _clear_checkpoint():
+    try:
+        os.remove(BACKFILL_CHECKPOINT)
+    except FileNotFoundError:
+        pass
+
+
+def _missing_posters_query(after_id: int):
+    """Entries without a poster after `after_id`, in id order (ix_diary_missing_poster)."""
+    return (db.select(DiaryEntry).where(db.text(MISSING_POSTER_SQL), DiaryEntry.id > after_id)
+            .order_by(DiaryEntry.id))
+
+
+@bp.cli.command("backfill-posters")
+@click.option("--workers", type=int, default=8, show_default=True, help="Concurrent TMDb lookups.")
+@click.option("--batch-size", type=int, default=200, show_default=True, help="Entries per commit.")
+@click.option("--limit", type=int, default=None, help="Stop after this many entries.")
+@click.option("--dry-run", is_flag=True, help="Print match decisions, write nothing.")
+@click.option("--restart", is_flag=True, help="Ignore the checkpoint and start from the first entry.")
+def backfill_posters(workers, batch_size, limit, dry_run, restart):
+    """Find TMDb posters for diary entries that have none.
+
+    Progress is committed per batch and checkpointed (instance/backfill_posters.json),
+    so an interrupted run picks up where it stopped. A run that gets to the end
+    removes the checkpoint, so the next one starts from the first entry again.
+    """
+    def count(after_id):
+        return db.session.scalar(
+            _missing_posters_query(after_id).with_only_columns(db.func.count()).order_by(None))
+
+    start_id = 0 if (restart or dry_run) else _read_checkpoint()
+    total = count(start_id)
+    if start_id and not total:
+        _clear_checkpoint()  # left by a run that finished; nothing to resume
+        start_id, total = 0, count(0)
+    if start_id:
+        print(f"Resuming after entry #{start_id} (--restart to start over).")
+    if limit:
+        total = min(total, limit)
+    if not total:
+        print("Nothing to backfill.")
+        return
+
+    from matching import best_match
+    from tmdb_async import AsyncTMDBClient, TMDBBatchRunner
+    runner = TMDBBatchRunner(AsyncTMDBClient(tmdb._get_current_object(), concurrency=workers))
+    found: dict[tuple, list] = {}  # (kind, title, year) -> candidates, shared across batches
+    filled = done = 0
+    misses = []
+    last_id = start_id
+    started = time.monotonic()
+
+    while done < total:
+        batch = db.session.scalars(
+            _missing_posters_query(last_id).limit(min(batch_size, total - done))).all()
+        if not batch:
+            break
+        todo = [(e, _backfill_year(e)) for e in batch]
+
+        # identical (kind, title, year) lookups are made once per run
+        queries = [q for q in dict.fromkeys(("movie" if e.kind == "movie" else "series", e.title, year)
+                                            for e, year in todo) if q not in found]
+        for q, res in zip(queries, runner.map(_backfill_search, queries)):
+            found[q] = [] if isinstance(res, Exception) else res
+
+        for e, year in todo:
+            results = found[("movie" if e.kind == "movie" else "series", e.title, year)]
+            # pick best match (exact > fuzzy > popularity already implied)
+            best, score = best_match(e.title, year, results)
+            if best and best.get("poster"):
+                if dry_run:
+                    print(f"  {e.title} ({year or 'n/a'}) -> {best['title']} ({best['year'] or 'n/a'}) "
+                          f"score {score:.2f}")
+                else:
+                    e.poster_url = best["poster"]
+                # Optional: lock in a stable external id when we found a good hit
+                # e.external_id = f"tmdb:{best['id']}"
+                filled += 1
+            else:
+                if dry_run:
+                    print(f"  {e.title} ({year or 'n/a'}) -> no match")
+                misses.append(f"{e.title} ({year or 'n/a'})")
+
+        last_id = batch[-1].id
+        done += len(batch)
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+            _write_checkpoint(last_id)
+
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0.0
+        eta = (total - done) / rate if rate else 0.0
+        print(f"[{done}/{total}] filled {filled} · {rate:.1f} entries/s · ETA {eta:.0f}s", flush=True)
+
+    if not dry_run and db.session.scalar(_missing_posters_query(last_id).limit(1)) is None:
+        _clear_checkpoint()  # reached the end: later runs retry earlier misses
+
+    verb = "Would backfill" if dry_run else "Backfilled"
+    print(f"{verb} posters for {filled} entries.")
+    if misses:
+        print("No poster found for:")
+        for m in misses[:50]:
+            print(" -", m)
+        if len(misses) > 50:
+            print(f" ... and {len(misses)-50} more")
+
+
+# --- Poster lookups (import + backfill) ---
+def _pick_poster(res, title):
+    # prefer exact title (case/diacritics-insensitive), else first with poster
+    from matching import pick_exact_or_first
+    pick = pick_exact_or_first(res or [], title)
+    if not pick:
+        return None
+    return f"https://image.tmdb.org/t/p/w500{pick['poster_path']}"
+
+
+def _index_hit(title: str, year: int | None, kind: str = "movie"):
+    """Local title index lookup; None on a miss (or if the index is unusable)."""
+    try:
+        return title_index.find(title, year, kind)
+    except sqlite3.Error:
+        current_app.logger.warning("Title index lookup failed", exc_info=True)
+        return None
+
+
+def _index_detail_path(kind, tmdb_id):
+    return f"/movie/{tmdb_id}" if kind == "movie" else f"/tv/{tmdb_id}"
+
+
+def _index_remember(kind, hit, details) -> str | None:
+    # ID exports carry no poster: keep the one details gave us for next time
+    path = (details or {}).get("poster_path")
+    date = (details or {}).get("release_date") or (details or {}).get("first_air_date") or ""
+    title_index.set_poster(kind, hit["id"], path, int(date[:4]) if date[:4].isdigit() else None)
+    return title_index.poster_url(path)
+
+
+async def _index_poster_async(aclient, title, year, kind="movie"):
+    """Poster URL via the local index (one details call if it lacks a poster), else None."""
+    hit = _index_hit(title, year, kind)
+    if not hit:
+        return None, None
+    if hit["poster_path"]:
+        return hit, title_index.poster_url(hit["poster_path"])
+    try:
+        return hit, _index_remember(kind, hit, await aclient._get(_index_detail_path(kind, hit["id"])))
+    except Exception:
+        return hit, None
+
+
+async def _poster_for_movie_async(aclient, key):
+    title, year = key
+    _, url = await _index_poster_async(aclient, title, year)
+    if url:
+        return url
+
+    async def _search(y):
+        try:
+            js = await aclient._get("/search/movie", query=title, include_adult=False,
+                                    year=y or None, primary_release_year=y or None)
+            return js.get("results", [])
+        except Exception:
+            return []
+
+    return (_pick_poster(await _search(year), title)
+            or _pick_poster(await _search(None), title))
+
+
+def tmdb_posters_for_movies(keys) -> dict:
+    """Resolve many (title, year) pairs concurrently -> {key: poster_url | None}."""
+    keys = list(dict.fromkeys(keys))
+    results = tmdb_batch.map(_poster_for_movie_async, keys)
+    return {k: (None if isinstance(r, Exception) else r) for k, r in zip(keys, results)}
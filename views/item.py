@@ -0,0 +1,283 @@
+import mimetypes
+import os
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+from flask import Blueprint, abort, current_app, jsonify, redirect, render_template, request, send_file, url_for
+from sqlalchemy import or_
+
+from extensions import db, lazy, make_cache, poster_cache, tmdb
+from http_cache import conditional, title_validator
+from matching import norm_title
+from models import DiaryEntry, Title, TitleCredit, TitleGenre, TitleStudio, search_diary
+from poster_cache import PosterCache, POSTER_SIZES, IMG_BASE, poster_proxy_path
+
+bp = Blueprint("item", __name__)
+
+
+@bp.app_template_filter("poster")
+def poster_filter(url, size="thumb"):
+    """TMDb poster URL -> our cached proxy URL at `size`; other URLs pass through."""
+    p = poster_proxy_path(url, size)
+    if not p:
+        return url
+    size, _, filename = p.partition("/")
+    return url_for("item.poster_image", size=size, filename=filename)
+
+
+@bp.route("/search")
+def search():
+    q = request.args.get("q", "").strip()
+    results = []
+    local = search_diary(q) if q else []  # your own diary first, no network
+    if q:
+        try:
+            results = tmdb.search(q)
+        except Exception as e:
+            return render_template("search.html", q=q, results=[], local=local, error=str(e))
+    return render_template("search.html", q=q, results=results, local=local, error=None)
+
+
+# --- Search-as-you-type ---
+# /api/suggest answers from the diary and from recent TMDb queries first and
+# only goes upstream when those don't fill the list. Keys are normalized
+# queries, and concurrent requests for the same one share a single TMDb call.
+SUGGEST_LIMIT = 8
+SUGGEST_MIN_CHARS = 2
+SUGGEST_TTL = 10 * 60
+# norm query -> tmdb.search() results
+suggest_cache = lazy("suggest_cache", lambda app: make_cache("suggest", 2048, max_age=SUGGEST_TTL))
+_suggest_inflight: dict[str, Future] = {}
+_suggest_lock = threading.Lock()
+
+
+def _title_matches(title: str, nq: str) -> bool:
+    n = norm_title(title)
+    return n.startswith(nq) or f" {nq}" in n
+
+
+def _cached_suggestions(nq: str) -> list[dict]:
+    """Hits for `nq` from the longest cached shorter query that covers it."""
+    for end in range(len(nq), SUGGEST_MIN_CHARS - 1, -1):
+        hit = suggest_cache.get(nq[:end], SUGGEST_TTL)
+        if hit is not None:
+            return [r for r in hit[0] if _title_matches(r["title"], nq)]
+    return []
+
+
+def _tmdb_suggestions(q: str, nq: str) -> list[dict]:
+    """tmdb.search(q), coalesced per normalized query."""
+    with _suggest_lock:
+        fut = _suggest_inflight.get(nq)
+        owner = fut is None
+        if owner:
+            fut = _suggest_inflight[nq] = Future()
+    if not owner:
+        return fut.result()  # the owner always resolves it, success or not
+    try:
+        results = tmdb.search(q)
+        suggest_cache.set(nq, results)
+        fut.set_result(results)
+        return results
+    except Exception as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _suggest_lock:
+            _suggest_inflight.pop(nq, None)
+
+
+def _diary_suggestions(q: str, limit: int) -> list[dict]:
+    like = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    E = DiaryEntry
+    rows = db.session.execute(
+        db.select(E.kind, E.tmdb_id, E.title, E.release_year, E.poster_url)
+        .where(or_(E.title.ilike(f"{like}%", escape="\\"), E.title.ilike(f"% {like}%", escape="\\")))
+        .order_by(E.date_watched.desc().nullslast()).limit(limit * 4)).all()
+    out, seen = [], set()
+    for r in rows:
+        key = (r.kind, r.tmdb_id or r.title.lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append({"kind": r.kind, "id": r.tmdb_id, "title": r.title, "year": r.release_year,
+                    "poster": r.poster_url, "source": "diary"})
+    return out[:limit]
+
+
+@bp.route("/api/suggest")
+def api_suggest():
+    q = request.args.get("q", "").strip()
+    nq = norm_title(q)
+    if len(nq) < SUGGEST_MIN_CHARS:
+        return jsonify({"q": q, "results": []})
+    results = _diary_suggestions(q, SUGGEST_LIMIT)
+    seen = {(r["kind"], r["id"]) for r in results if r["id"]}
+
+    def add(hits, source):
+        for h in hits:
+            if len(results) >= SUGGEST_LIMIT:
+                break
+            if (h["kind"], h["id"]) not in seen:
+                seen.add((h["kind"], h["id"]))
+                results.append({"kind": h["kind"], "id": h["id"], "title": h["title"],
+                                "year": int(h["year"]) if h.get("year") else None,
+                                "poster": h.get("poster"), "source": source})
+
+    add(_cached_suggestions(nq), "cache")
+    error = None
+    if len(results) < SUGGEST_LIMIT and suggest_cache.get(nq, SUGGEST_TTL) is None:
+        try:
+            add(_tmdb_suggestions(q, nq), "tmdb")
+        except Exception as e:
+            current_app.logger.warning("Suggest: TMDb search failed for %r: %s", q, e)
+            error = "TMDb unavailable"
+    for r in results:
+        r["poster"] = poster_filter(r["poster"], "thumb")
+    resp = jsonify({"q": q, "results": results, "error": error})
+    resp.cache_control.private = True
+    resp.cache_control.max_age = 60
+    return resp
+
+
+# --- Item pages ---
+# Details come from the local titles table (see models.Title); TMDb is only
+# asked on a miss and refreshes stale rows in the background.
+TITLE_REFRESH_AFTER = timedelta(days=int(os.environ.get("TITLE_REFRESH_DAYS", "7")))
+_title_refreshing: set[tuple[str, int]] = set()
+_title_refresh_lock = threading.Lock()
+
+
+def _store_title(kind: str, item: dict) -> Title:
+    """Upsert a get_movie/get_series result into titles + child tables (no commit)."""
+    t = db.session.scalar(db.select(Title).filter_by(kind=kind, tmdb_id=item["id"]))
+    if t is None:
+        t = Title(kind=kind, tmdb_id=item["id"])
+        db.session.add(t)
+    runtime = item.get("runtime")
+    t.title = item.get("title") or "Untitled"
+    t.poster_url = item.get("poster")
+    t.overview = item.get("overview")
+    t.year = item.get("year")
+    t.status = item.get("status")
+    t.runtime = int(runtime) if runtime else None
+    t.vote_average = item.get("rating")
+    t.fetched_at = datetime.utcnow()
+    t.genres = [TitleGenre(position=i, name=g) for i, g in enumerate(item.get("genres") or [])]
+    t.studios = [TitleStudio(position=i, name=n) for i, n in enumerate(item.get("studios") or [])]
+    t.credits = [TitleCredit(position=i, person_id=c.get("id"), name=c.get("name"),
+                             character=c.get("character"), photo_url=c.get("photo"))
+                 for i, c in enumerate(item.get("cast") or [])]
+    return t
+
+
+def _fetch_title(kind: str, tmdb_id: int) -> dict:
+    return tmdb.get_movie(tmdb_id) if kind == "movie" else tmdb.get_series(tmdb_id)
+
+
+def _refresh_title(app, kind: str, tmdb_id: int):
+    with app.app_context():
+        try:
+            _store_title(kind, _fetch_title(kind, tmdb_id))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.warning("Background refresh of %s %s failed", kind, tmdb_id, exc_info=True)
+        finally:
+            with _title_refresh_lock:
+                _title_refreshing.discard((kind, tmdb_id))
+
+
+def get_title(kind: str, tmdb_id: int) -> dict:
+    """Item details from the local store; TMDb only on a miss.
+
+    Rows older than TITLE_REFRESH_AFTER are still served and refreshed in a
+    background thread. Raises requests.HTTPError when the title isn't stored
+    and TMDb can't provide it.
+    """
+    kind = "movie" if kind == "movie" else "series"
+    t = db.session.scalar(db.select(Title).filter_by(kind=kind, tmdb_id=tmdb_id))
+    if t is None:
+        item = _fetch_title(kind, tmdb_id)
+        try:
+            _store_title(kind, item)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()  # e.g. a concurrent request stored it first
+        return item
+
+    _refresh_if_stale(kind, tmdb_id, t.fetched_at)
+    return t.to_item()
+
+
+def _refresh_if_stale(kind: str, tmdb_id: int, fetched_at: datetime):
+    """Refresh a stored title in a background thread once it's older than TITLE_REFRESH_AFTER."""
+    if datetime.utcnow() - fetched_at <= TITLE_REFRESH_AFTER:
+        return
+    key = (kind, tmdb_id)
+    with _title_refresh_lock:
+        start = key not in _title_refreshing
+        _title_refreshing.add(key)
+    if start:
+        threading.Thread(target=_refresh_title, args=(current_app._get_current_object(), *key),
+                         daemon=True).start()
+
+
+def _item_validator(kind, item_id, **_):
+    # runs before 304s and page_cache hits, which never reach get_title()
+    v = title_validator(kind, item_id)
+    if v:
+        _refresh_if_stale("movie" if kind == "movie" else "series", item_id, v[1])
+    return v
+
+
+@bp.route("/item/<kind>/<int:item_id>")
+@conditional(_item_validator, fragment=True)
+def item_detail(kind, item_id):
+    import requests  # comes with the TMDb client; kept off the startup path
+    try:
+        item = get_title(kind, item_id)
+        return render_template("item.html", item=item)
+    except requests.HTTPError as ex:
+        status = getattr(getattr(ex, "response", None), "status_code", None)
+        if status == 404:
+            abort(404, description="We couldn’t find that title on TMDb.")
+        # Anything else: treat as server error
+        current_app.logger.exception("TMDb error on %s %s", kind, item_id)
+        return render_template("500.html",
+                               description="Upstream API error. Please try again."), 500
+    except requests.RequestException:
+        current_app.logger.exception("TMDb unreachable for %s %s", kind, item_id)
+        return render_template("500.html",
+                               description="Upstream API error. Please try again."), 500
+
+
+@bp.route("/img/poster/<size>/<path:filename>")
+def poster_image(size, filename):
+    import requests
+    if size not in POSTER_SIZES or not PosterCache.valid_path(filename):
+        abort(404)
+    try:
+        blob, digest = poster_cache.get(size, filename)
+    except requests.HTTPError as ex:
+        if getattr(ex.response, "status_code", None) == 404:
+            abort(404)
+        return redirect(f"{IMG_BASE}/{POSTER_SIZES[size]}/{filename}")
+    except requests.RequestException:
+        # can't reach TMDb from here; let the browser try directly
+        return redirect(f"{IMG_BASE}/{POSTER_SIZES[size]}/{filename}")
+    mimetype = mimetypes.guess_type(filename)[0] or "image/jpeg"
+    resp = send_file(blob, mimetype=mimetype, etag=digest, conditional=True, max_age=365 * 24 * 3600)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True  # a poster path never changes content
+    return resp
+
+
+@bp.route("/api/tmdb/stats")
+def api_tmdb_stats():
+    # per-call latency (p50/p95) and cache counters for this process
+    return jsonify({
+        "latency": tmdb.latency.summary(),
+        "cache": tmdb.cache.stats() if tmdb.cache else None,
+    })
@@ -0,0 +1,26 @@
+import os
+
+from flask import Blueprint, Response, current_app, request, send_from_directory
+
+from http_cache import asset_version
+
+bp = Blueprint("pwa", __name__)
+
+
+@bp.route("/manifest.json")
+def manifest():
+    resp = send_from_directory(current_app.static_folder, "manifest.json", max_age=24 * 3600)
+    resp.cache_control.public = True
+    return resp
+
+
+@bp.route("/sw.js")
+def service_worker():
+    # the worker embeds the asset hash so a deploy with new CSS/JS replaces it
+    with open(os.path.join(current_app.static_folder, "sw.js"), encoding="utf-8") as fh:
+        body = fh.read().replace("__ASSET_VERSION__", asset_version())
+    resp = Response(body, mimetype="application/javascript")
+    resp.headers["Service-Worker-Allowed"] = "/"
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.set_etag(asset_version())
+    return resp.make_conditional(request)
@@ -0,0 +1,21 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    python wsgi.py                      # waitress, e.g. on Windows
+
+`flask run` loads .env by itself; WSGI servers don't, so it's done here.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+from app import create_app  # noqa: E402
+
+app = create_app()
+
+if __name__ == "__main__":
+    from waitress import serve
+    serve(app, host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", "8000")),
+          threads=int(os.environ.get("WEB_THREADS", "8")))